@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for hot paths in the Financer backend.
+
+Run with: python benchmark.py
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from cache import encode_json
+from market_data import ReplayProvider
+from nse_data import NSEDataService
+from ticker_search import TickerIndex, TickerRecord
+
+
+def _timeit(func: Callable[[], Any], repeat: int = 20) -> float:
+    """Return the best wall-clock time of `repeat` runs in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def make_download_frame(tickers: List[str], rows: int = 1, seed: int = 7) -> pd.DataFrame:
+    """Build a frame shaped like yf.download(..., group_by='ticker')"""
+    rng = np.random.default_rng(seed)
+    fields = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+    columns = pd.MultiIndex.from_product([tickers, fields])
+    values = rng.uniform(100, 5000, size=(rows, len(columns)))
+    frame = pd.DataFrame(values, columns=columns, index=pd.date_range("2025-01-01", periods=rows))
+    # A few tickers with no data, as yfinance returns for delisted symbols
+    for ticker in tickers[::37]:
+        frame[(ticker, "Close")] = np.nan
+    return frame
+
+
+def legacy_frame_to_quotes(service: NSEDataService, data: pd.DataFrame, chunk: List[str]) -> List[Dict[str, Any]]:
+    """Per-ticker iloc conversion used by get_stock_data before the columnar path"""
+    processed_data = []
+    for ticker in chunk:
+        try:
+            stock_data = data if len(chunk) == 1 else data[ticker]
+            if stock_data.empty:
+                continue
+            latest = stock_data.iloc[-1]
+            if pd.isna(latest['Close']):
+                continue
+            current_price = float(latest['Close'])
+            open_price = float(latest['Open'])
+            change = current_price - open_price
+            p_change = (change / open_price) * 100 if open_price else 0
+            symbol = ticker.replace(".NS", "")
+            processed_data.append({
+                "symbol": symbol,
+                "name": service.company_names.get(symbol, symbol),
+                "lastPrice": f"{current_price:,.2f}",
+                "pChange": f"{p_change:+.2f}",
+                "change": change,
+                "change_percent": p_change,
+                "otherDetails": {
+                    "open": float(latest['Open']),
+                    "high": float(latest['High']),
+                    "low": float(latest['Low']),
+                    "volume": int(latest['Volume']) if not pd.isna(latest['Volume']) else 0,
+                    "chartToday": None
+                }
+            })
+        except Exception:
+            continue
+    return processed_data
+
+
+def bench_quote_conversion():
+    """Compare the legacy per-ticker loop with the columnar conversion"""
+    service = NSEDataService()
+    print("Quote conversion (best of 20, ms)")
+    print(f"{'tickers':>8} {'loop':>10} {'columnar':>10} {'speedup':>8}")
+    for size in (50, 500, 2000):
+        tickers = [f"SYM{i}.NS" for i in range(size)]
+        frame = make_download_frame(tickers)
+        loop_ms = _timeit(lambda: legacy_frame_to_quotes(service, frame, tickers))
+        vector_ms = _timeit(lambda: service._frame_to_quotes(frame, tickers))
+        print(f"{size:>8} {loop_ms:>10.2f} {vector_ms:>10.2f} {loop_ms / vector_ms:>7.1f}x")
+
+
+def bench_ticker_search():
+    """Build cost, memory and query latency of the ticker index at full NSE size"""
+    service = NSEDataService()
+    master = service.ticker_master
+    # Pad the bundled master out to roughly the full ~2,000 row EQ list
+    records = [
+        TickerRecord(f"{r.symbol}{n or ''}", f"{r.name} {n}" if n else r.name, r.sector)
+        for n in range(2000 // len(master) + 1)
+        for r in master
+    ][:2000]
+
+    index = TickerIndex(records)
+    print(f"\nTicker index: {len(records)} rows, build {index.build_ms:.1f}ms, "
+          f"{index.memory_bytes / 1024:.0f} KiB resident")
+
+    for query in ("REL", "hdfc bank", "tata mot", "relaince", "LIMITED"):
+        elapsed = _timeit(lambda: index.search(query), repeat=200)
+        print(f"{query!r:>12} {elapsed * 1000:>8.1f}us")
+
+
+def bench_request_path(requests: int = 500):
+    """Latency of /stocks end to end against the replay provider, no network needed"""
+    from fastapi.testclient import TestClient
+    import main
+
+    main.limiter.enabled = False
+    service = main.nse_service
+    replay = ReplayProvider(os.path.join(os.path.dirname(__file__), "data", "recordings"))
+    service.provider = service.universe_provider = replay
+    start = time.perf_counter()
+    asyncio.run(service.refresh_snapshot())
+    print(f"\nReplay snapshot: {len(service.snapshot.data)} quotes in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    client = TestClient(main.app)
+    for query in ("skip=0&limit=20", "sort=pChange&limit=50", "sector=Financial%20Services&fields=symbol,lastPrice"):
+        timings = []
+        for _ in range(requests):
+            begin = time.perf_counter()
+            client.get(f"/stocks?{query}")
+            timings.append((time.perf_counter() - begin) * 1000)
+        p50, p99 = np.percentile(timings, [50, 99])
+        print(f"{query:>55} p50 {p50:6.2f}ms  p99 {p99:6.2f}ms")
+
+
+def bench_cached_response():
+    """Cost of turning a cache hit into a response body: decode + re-encode vs stored bytes"""
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, Response
+
+    service = NSEDataService()
+    print("\nCached response body (best of 20, ms)")
+    print(f"{'quotes':>8} {'KiB':>6} {'redis+model':>12} {'memory+model':>13} {'bytes':>8}")
+    for size in (20, 500, 2000):
+        tickers = [f"SYM{i}.NS" for i in range(size)]
+        value = {"data": service._frame_to_quotes(make_download_frame(tickers), tickers), "total_count": size}
+        stored_text = json.dumps(value, default=str)
+        stored_bytes = encode_json(value)
+
+        # Redis hit before: json.loads, jsonable_encoder, json.dumps in JSONResponse
+        redis_ms = _timeit(lambda: JSONResponse(jsonable_encoder(json.loads(stored_text))).body)
+        # Memory hit before: the object still goes through jsonable_encoder and json.dumps
+        memory_ms = _timeit(lambda: JSONResponse(jsonable_encoder(value)).body)
+        bytes_ms = _timeit(lambda: Response(content=stored_bytes, media_type="application/json").body)
+        print(f"{size:>8} {len(stored_bytes) / 1024:>6.0f} {redis_ms:>12.3f} {memory_ms:>13.3f} {bytes_ms:>8.4f}")
+
+
+if __name__ == "__main__":
+    bench_quote_conversion()
+    bench_ticker_search()
+    bench_cached_response()
+    bench_request_path()
@@ -3,18 +3,41 @@ Caching service for improved performance and reduced API calls.
 """
 
 import asyncio
+import gzip
+import heapq
+import itertools
 import json
-from typing import Any, Optional
-from datetime import datetime, timedelta
+import logging
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from datetime import date, datetime, timedelta
 import redis.asyncio as redis
 from dataclasses import dataclass
 from enum import Enum
 
+from cache_codec import ValueCodec
+from cache_metrics import CacheMetrics, key_namespace
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "financer:invalidate"
+WARM_START_VERSION = 1
+
 
 class CacheBackend(Enum):
     """Cache backend types"""
     MEMORY = "memory"
     REDIS = "redis"
+    TIERED = "tiered"  # in-process L1 in front of Redis
 
 
 @dataclass
@@ -23,17 +46,214 @@ class CacheItem:
     data: Any
     expires_at: datetime
     created_at: datetime
+    # Past expires_at the item may still be served as stale until this time
+    stale_until: Optional[datetime] = None
+    # Approximate resident size in bytes
+    size: int = 0
+    # Final JSON bytes, kept for routes that return cached responses without re-encoding
+    encoded: Optional[bytes] = None
+    # Tags the item is indexed under for invalidate_tag
+    tags: Tuple[str, ...] = ()
+
+    @property
+    def reclaim_at(self) -> datetime:
+        return self.stale_until or self.expires_at
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode values JSON has no type for: numpy scalars, dates, anything else as text"""
+    if hasattr(obj, "item"):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def encode_json(value: Any) -> bytes:
+    """Compact JSON bytes, via orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+
+def decode_json(data: Union[bytes, str]) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _escape_glob(text: str) -> str:
+    """Escape Redis MATCH metacharacters so text matches only itself"""
+    return re.sub(r"([*?\[\]\\])", r"\\\1", text)
+
+
+class MemoryStore:
+    """LRU store bounded by entry count and approximate bytes, with an expiry heap"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, CacheItem]" = OrderedDict()
+        # (reclaim_at, seq, key); entries for replaced or removed items are skipped lazily
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._seq = itertools.count()
+        # tag -> keys of live items carrying it
+        self._tags: Dict[str, Set[str]] = {}
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+        # Called with (key, "evictions" | "expirations") for entries dropped by the store
+        self.on_drop: Optional[Callable[[str, str], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def __getitem__(self, key: str) -> CacheItem:
+        return self._items[key]
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def items(self) -> Iterator[Tuple[str, CacheItem]]:
+        """Entries from least to most recently used"""
+        return iter(list(self._items.items()))
+
+    def get(self, key: str) -> Optional[CacheItem]:
+        """Look up an item and mark it most recently used"""
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+        return item
+
+    def put(self, key: str, item: CacheItem) -> bool:
+        """Store an item, evicting least recently used entries to stay within bounds"""
+        if item.size > self.max_bytes:
+            self.rejected += 1
+            self.pop(key)
+            return False
+
+        self.pop(key)
+        self._items[key] = item
+        self.bytes += item.size
+        heapq.heappush(self._heap, (item.reclaim_at, next(self._seq), key))
+        for tag in item.tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._items) > self.max_entries or self.bytes > self.max_bytes:
+            evicted_key = next(iter(self._items))
+            self.pop(evicted_key)
+            self.evictions += 1
+            if self.on_drop is not None:
+                self.on_drop(evicted_key, "evictions")
+
+        if len(self._heap) > 2 * len(self._items) + 64:
+            self._rebuild_heap()
+        return True
+
+    def pop(self, key: str, default: Optional[CacheItem] = None) -> Optional[CacheItem]:
+        item = self._items.pop(key, None)
+        if item is None:
+            return default
+        self.bytes -= item.size
+        for tag in item.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return item
+
+    def pop_tag(self, tag: str) -> List[str]:
+        """Remove every item carrying a tag; returns their keys"""
+        keys = list(self._tags.get(tag, ()))
+        for key in keys:
+            self.pop(key)
+        return keys
+
+    def clear(self):
+        self._items.clear()
+        self._heap.clear()
+        self._tags.clear()
+        self.bytes = 0
+
+    def reclaim(self, now: Optional[datetime] = None) -> int:
+        """Drop items past their stale window, touching only heap entries that are due"""
+        now = now or datetime.utcnow()
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            item = self._items.get(key)
+            # The item may have been replaced with a later expiry since this entry was pushed
+            if item is not None and item.reclaim_at <= now:
+                self.pop(key)
+                removed += 1
+                if self.on_drop is not None:
+                    self.on_drop(key, "expirations")
+        self.expirations += removed
+        return removed
+
+    def _rebuild_heap(self):
+        """Discard heap entries left behind by overwritten or evicted keys"""
+        self._heap = [(item.reclaim_at, next(self._seq), key) for key, item in self._items.items()]
+        heapq.heapify(self._heap)
+
+    def get_stats(self) -> dict:
+        return {
+            "keys": len(self._items),
+            "resident_bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected": self.rejected,
+            "tags": len(self._tags)
+        }
 
 
 class CacheService:
     """High-performance caching service with multiple backend support"""
 
-    def __init__(self, backend: CacheBackend = CacheBackend.MEMORY):
-        self.backend = backend
-        self.memory_cache: dict[str, CacheItem] = {}
-        self.redis_client: Optional[redis.Redis] = None
+    def __init__(
+        self,
+        backend: CacheBackend = CacheBackend.MEMORY,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        redis_client: Optional[redis.Redis] = None,
+        l1_ttl: float = 5.0,
+        compress_min_bytes: int = 1024,
+        compression: str = "auto"
+    ):
+        self.backend = CacheBackend(backend)
+        # The whole cache for the memory backend, the per-process L1 for the tiered one
+        self.memory_cache = MemoryStore(max_entries, max_bytes)
+        self.metrics = CacheMetrics()
+        self.memory_cache.on_drop = self.metrics.count
+        self.redis_client: Optional[redis.Redis] = redis_client
+        # Applied to values written to Redis
+        self.codec = ValueCodec(compress_min_bytes, compression)
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Tags of in-flight computations, and those whose result an invalidation made outdated
+        self._inflight_tags: Dict[asyncio.Task, Tuple[str, ...]] = {}
+        self._abandoned: Set[asyncio.Task] = set()
+        self.computations = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.revalidations = 0
+
+        # Tiered mode
+        self.l1_ttl = l1_ttl
+        self.instance_id = uuid.uuid4().hex
+        self._l1_enabled = False  # only while subscribed to invalidations
+        self._invalidation_generation = 0
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.invalidations_published = 0
+        self.invalidations_received = 0
 
-        if backend == CacheBackend.REDIS:
+        if self.backend in (CacheBackend.REDIS, CacheBackend.TIERED) and redis_client is None:
             self._init_redis()
 
     def _init_redis(self):
@@ -41,48 +261,179 @@ class CacheService:
         try:
             import os
             redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            self.redis_client = redis.from_url(redis_url)
         except Exception as e:
             print(f"Redis initialization failed: {e}, falling back to memory cache")
             self.backend = CacheBackend.MEMORY
 
+    @property
+    def _uses_redis(self) -> bool:
+        return self.backend in (CacheBackend.REDIS, CacheBackend.TIERED) and self.redis_client is not None
+
+    @property
+    def _tiered(self) -> bool:
+        return self.backend == CacheBackend.TIERED and self.redis_client is not None
+
+    @property
+    def _redis(self) -> redis.Redis:
+        """The Redis client, on paths only reached when _uses_redis is true"""
+        assert self.redis_client is not None
+        return self.redis_client
+
+    def _get_local(self, key: str) -> Optional[CacheItem]:
+        """Fresh item from the in-process store, dropping it once past its stale window"""
+        item = self.memory_cache.get(key)
+        now = datetime.utcnow()
+        if item and now < item.expires_at:
+            return item
+        elif item and now >= item.reclaim_at:
+            # Remove expired item
+            self.memory_cache.pop(key)
+        return None
+
+    def _set_local(
+        self,
+        key: str,
+        value: Any,
+        ttl: float,
+        stale_ttl: int = 0,
+        payload: Optional[bytes] = None,
+        keep_encoded: bool = False,
+        tags: Iterable[str] = ()
+    ) -> bool:
+        payload = payload if payload is not None else encode_json(value)
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        return self.memory_cache.put(key, CacheItem(
+            data=value,
+            expires_at=expires_at,
+            created_at=datetime.utcnow(),
+            stale_until=expires_at + timedelta(seconds=stale_ttl) if stale_ttl else None,
+            # Encoded length stands in for the object's size; kept bytes count twice
+            size=len(payload) * (2 if keep_encoded else 1),
+            encoded=payload if keep_encoded else None,
+            tags=tuple(tags)
+        ))
+
+    async def _read(self, key: str) -> Optional[CacheItem]:
+        """Fresh cache item from whichever backend is active"""
+        if self._tiered:
+            return await self._read_tiered(key)
+        elif self._uses_redis:
+            data = await self._redis.get(f"financer:{key}")
+            if data:
+                payload = self.codec.decode(data)
+                return CacheItem(decode_json(payload), datetime.max, datetime.utcnow(), encoded=payload)
+            return None
+        # Memory cache
+        return self._get_local(key)
+
+    async def _lookup(self, key: str) -> Optional[CacheItem]:
+        """_read, counted as a hit or miss and timed for the key's namespace"""
+        start = time.perf_counter()
+        item = await self._read(key)
+        self.metrics.observe(key, "get", time.perf_counter() - start)
+        self.metrics.count(key, "hits" if item is not None else "misses")
+        return item
+
     async def get(self, key: str) -> Optional[Any]:
         """Get item from cache"""
         try:
-            if self.backend == CacheBackend.REDIS and self.redis_client:
-                data = await self.redis_client.get(f"financer:{key}")
-                if data:
-                    return json.loads(data)
-            else:
-                # Memory cache
-                item = self.memory_cache.get(key)
-                if item and datetime.utcnow() < item.expires_at:
-                    return item.data
-                elif item:
-                    # Remove expired item
-                    del self.memory_cache[key]
+            item = await self._lookup(key)
+            if item is not None:
+                return item.data
         except Exception as e:
             print(f"Cache get error: {e}")
 
         return None
 
-    async def set(self, key: str, value: Any, ttl: int = 300) -> bool:
-        """Set item in cache with TTL in seconds"""
+    async def get_encoded(self, key: str) -> Optional[bytes]:
+        """Get a cached value as JSON bytes, ready to send as a response body"""
         try:
-            expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+            item = await self._lookup(key)
+            if item is not None:
+                return item.encoded if item.encoded is not None else encode_json(item.data)
+        except Exception as e:
+            print(f"Cache get error: {e}")
 
-            if self.backend == CacheBackend.REDIS and self.redis_client:
-                await self.redis_client.setex(
-                    f"financer:{key}",
-                    ttl,
-                    json.dumps(value, default=str)
-                )
+        return None
+
+    async def _read_tiered(self, key: str) -> Optional[CacheItem]:
+        """L1 first, then Redis, copying Redis hits into L1 for at most l1_ttl seconds"""
+        if self._l1_enabled:
+            item = self._get_local(key)
+            if item is not None:
+                self.l1_hits += 1
+                return item
+
+        generation = self._invalidation_generation
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.get(f"financer:{key}")
+            pipe.pttl(f"financer:{key}")
+            data, pttl = await pipe.execute()
+        if not data:
+            self.misses += 1
+            return None
+
+        self.l2_hits += 1
+        payload = self.codec.decode(data)
+        value = decode_json(payload)
+        # Skip L1 if an invalidation arrived while Redis was being read; the value may predate it
+        if self._l1_enabled and generation == self._invalidation_generation and pttl > 0:
+            self._set_local(key, value, min(pttl / 1000, self.l1_ttl), payload=payload, keep_encoded=True)
+        return CacheItem(value, datetime.max, datetime.utcnow(), encoded=payload)
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int = 300,
+        stale_ttl: int = 0,
+        keep_encoded: bool = False,
+        tags: Iterable[str] = ()
+    ) -> bool:
+        """Set item in cache with TTL in seconds, optionally kept stale_ttl longer for stale serving.
+
+        keep_encoded stores the JSON bytes next to the object in memory for get_encoded.
+        tags index the key so invalidate_tag can drop it with everything else sharing a tag.
+        """
+        start = time.perf_counter()
+        try:
+            return await self._store(key, value, ttl, stale_ttl, keep_encoded, tuple(tags))
+        finally:
+            self.metrics.observe(key, "set", time.perf_counter() - start)
+            self.metrics.count(key, "sets")
+
+    async def _store(
+        self,
+        key: str,
+        value: Any,
+        ttl: int,
+        stale_ttl: int,
+        keep_encoded: bool,
+        tags: Tuple[str, ...] = ()
+    ) -> bool:
+        try:
+            payload = encode_json(value)
+            if self._uses_redis:
+                stored = self.codec.encode(payload)
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.setex(f"financer:{key}", ttl, stored)
+                    if stale_ttl:
+                        # Separate copy so plain gets still expire at the TTL
+                        pipe.setex(f"financer:stale:{key}", ttl + stale_ttl, stored)
+                    if self._tiered:
+                        self._publish_invalidation(pipe, keys=[key])
+                    await pipe.execute()
+                if tags:
+                    await self._index_tags(key, tags, ttl + stale_ttl)
+                if self._tiered:
+                    self._invalidation_generation += 1
+                    if self._l1_enabled:
+                        self._set_local(key, value, min(ttl, self.l1_ttl), payload=payload, keep_encoded=keep_encoded)
             else:
                 # Memory cache
-                self.memory_cache[key] = CacheItem(
-                    data=value,
-                    expires_at=expires_at,
-                    created_at=datetime.utcnow()
+                return self._set_local(
+                    key, value, ttl, stale_ttl, payload=payload, keep_encoded=keep_encoded, tags=tags
                 )
 
             return True
@@ -90,26 +441,369 @@ class CacheService:
             print(f"Cache set error: {e}")
             return False
 
+    async def get_stale(self, key: str) -> Optional[Any]:
+        """Get an item kept past its TTL for stale serving"""
+        try:
+            if self._uses_redis:
+                data = await self._redis.get(f"financer:stale:{key}")
+                if data:
+                    return decode_json(self.codec.decode(data))
+            else:
+                item = self.memory_cache.get(key)
+                if item and item.stale_until and datetime.utcnow() < item.stale_until:
+                    return item.data
+        except Exception as e:
+            print(f"Cache get error: {e}")
+
+        return None
+
+    async def get_or_compute(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+        stale_ttl: int = 0,
+        tags: Iterable[str] = ()
+    ) -> Optional[Any]:
+        """Get item from cache, computing it once for all concurrent callers on a miss.
+
+        With stale_ttl, an expired value is returned immediately (marked stale) while a
+        single background refresh runs, so a slow or failing upstream is never waited on.
+        """
+        return await self._get_or_compute(key, coro_factory, ttl, stale_ttl, tuple(tags), encoded=False)
+
+    async def get_or_compute_encoded(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+        stale_ttl: int = 0,
+        tags: Iterable[str] = ()
+    ) -> Optional[bytes]:
+        """get_or_compute returning JSON bytes; hits are served without decoding or re-encoding"""
+        return await self._get_or_compute(key, coro_factory, ttl, stale_ttl, tuple(tags), encoded=True)
+
+    async def _get_or_compute(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        tags: Tuple[str, ...],
+        encoded: bool
+    ) -> Any:
+        cached = await (self.get_encoded(key) if encoded else self.get(key))
+        if cached is not None:
+            return cached
+
+        stale = await self.get_stale(key) if stale_ttl else None
+        task = self._inflight.get(key)
+        if stale is not None:
+            if task is None:
+                self.revalidations += 1
+                self._start_compute(key, coro_factory, ttl, stale_ttl, tags, keep_encoded=encoded)
+            self.stale_served += 1
+            self.metrics.count(key, "stale")
+            value = {**stale, "stale": True} if isinstance(stale, dict) else stale
+            return encode_json(value) if encoded else value
+
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._start_compute(key, coro_factory, ttl, stale_ttl, tags, keep_encoded=encoded)
+
+        # Shield so one cancelled caller does not cancel the shared computation
+        value = await asyncio.shield(task)
+        return encode_json(value) if encoded and value is not None else value
+
+    def _start_compute(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        tags: Tuple[str, ...] = (),
+        keep_encoded: bool = False
+    ) -> asyncio.Task:
+        self.computations += 1
+        task = asyncio.ensure_future(self._compute(key, coro_factory, ttl, stale_ttl, tags, keep_encoded))
+        task.add_done_callback(self._consume_task_result)
+        self._inflight[key] = task
+        if tags:
+            self._inflight_tags[task] = tags
+        return task
+
+    async def _compute(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int = 0,
+        tags: Tuple[str, ...] = (),
+        keep_encoded: bool = False
+    ) -> Optional[Any]:
+        """Run a single-flight computation and cache its result unless it was invalidated meanwhile"""
+        task = asyncio.current_task()
+        assert task is not None
+        try:
+            value = await coro_factory()
+            if value is not None and task not in self._abandoned:
+                await self.set(key, value, ttl, stale_ttl, keep_encoded=keep_encoded, tags=tags)
+            return value
+        finally:
+            self._abandoned.discard(task)
+            self._inflight_tags.pop(task, None)
+            # An invalidation may already have handed the key to a newer computation
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def _abandon_inflight(self, tag: str):
+        """Keep computations tagged `tag` that started before an invalidation from caching their result"""
+        for key, task in list(self._inflight.items()):
+            if tag in self._inflight_tags.get(task, ()):
+                self._abandoned.add(task)
+                # Later callers start a fresh computation instead of joining the outdated one
+                del self._inflight[key]
+
+    @staticmethod
+    def _consume_task_result(task: asyncio.Task):
+        """Mark errors as retrieved when every waiter has gone away"""
+        if not task.cancelled():
+            task.exception()
+
     async def delete(self, key: str) -> bool:
         """Delete item from cache"""
+        return await self.delete_many([key])
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Cached values for several keys in one round trip; misses are left out"""
+        if not keys:
+            return {}
+        start = time.perf_counter()
+        found = await self._read_many(keys)
+        elapsed = time.perf_counter() - start
+        # One latency sample per namespace in the batch
+        for key in {key_namespace(key): key for key in keys}.values():
+            self.metrics.observe(key, "get_many", elapsed)
+        for key in keys:
+            self.metrics.count(key, "hits" if key in found else "misses")
+        return found
+
+    async def _read_many(self, keys: List[str]) -> Dict[str, Any]:
+        found: Dict[str, Any] = {}
         try:
-            if self.backend == CacheBackend.REDIS and self.redis_client:
-                await self.redis_client.delete(f"financer:{key}")
+            if self._tiered:
+                missing = []
+                for key in keys:
+                    item = self._get_local(key) if self._l1_enabled else None
+                    if item is not None:
+                        self.l1_hits += 1
+                        found[key] = item.data
+                    else:
+                        missing.append(key)
+                if not missing:
+                    return found
+
+                generation = self._invalidation_generation
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.mget([f"financer:{key}" for key in missing])
+                    for key in missing:
+                        pipe.pttl(f"financer:{key}")
+                    values, *pttls = await pipe.execute()
+                for key, data, pttl in zip(missing, values, pttls):
+                    if not data:
+                        self.misses += 1
+                        continue
+                    self.l2_hits += 1
+                    payload = self.codec.decode(data)
+                    found[key] = decode_json(payload)
+                    if self._l1_enabled and generation == self._invalidation_generation and pttl > 0:
+                        self._set_local(
+                            key, found[key], min(pttl / 1000, self.l1_ttl), payload=payload, keep_encoded=True
+                        )
+            elif self._uses_redis:
+                values = await self._redis.mget([f"financer:{key}" for key in keys])
+                for key, data in zip(keys, values):
+                    if data:
+                        found[key] = decode_json(self.codec.decode(data))
             else:
-                self.memory_cache.pop(key, None)
+                for key in keys:
+                    item = self._get_local(key)
+                    if item is not None:
+                        found[key] = item.data
+        except Exception as e:
+            logger.error(f"Cache get_many failed for {len(keys)} keys: {e}")
+
+        return found
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = 300, stale_ttl: int = 0) -> bool:
+        """Set several items with the same TTL, pipelined into one round trip on Redis"""
+        start = time.perf_counter()
+        try:
+            return await self._store_many(items, ttl, stale_ttl)
+        finally:
+            elapsed = time.perf_counter() - start
+            for key in {key_namespace(key): key for key in items}.values():
+                self.metrics.observe(key, "set_many", elapsed)
+            for key in items:
+                self.metrics.count(key, "sets")
+
+    async def _store_many(self, items: Dict[str, Any], ttl: int, stale_ttl: int) -> bool:
+        try:
+            payloads = {key: encode_json(value) for key, value in items.items()}
+            if self._uses_redis:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for key, payload in payloads.items():
+                        stored = self.codec.encode(payload)
+                        pipe.setex(f"financer:{key}", ttl, stored)
+                        if stale_ttl:
+                            pipe.setex(f"financer:stale:{key}", ttl + stale_ttl, stored)
+                    if self._tiered:
+                        self._publish_invalidation(pipe, keys=list(payloads))
+                    await pipe.execute()
+                if self._tiered:
+                    self._invalidation_generation += 1
+                    if self._l1_enabled:
+                        for key, payload in payloads.items():
+                            self._set_local(key, items[key], min(ttl, self.l1_ttl), payload=payload)
+                return True
+
+            stored_all = True
+            for key, payload in payloads.items():
+                stored_all &= self._set_local(key, items[key], ttl, stale_ttl, payload=payload)
+            return stored_all
+        except Exception as e:
+            logger.error(f"Cache set_many failed for {len(items)} keys: {e}")
+            return False
+
+    async def delete_many(self, keys: List[str]) -> bool:
+        """Delete several items in one round trip"""
+        if not keys:
+            return True
+        try:
+            if self._uses_redis:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.unlink(*[f"financer:{key}" for key in keys], *[f"financer:stale:{key}" for key in keys])
+                    if self._tiered:
+                        self._publish_invalidation(pipe, keys=list(keys))
+                    await pipe.execute()
+                if self._tiered:
+                    self._invalidation_generation += 1
+                    for key in keys:
+                        self.memory_cache.pop(key)
+            else:
+                for key in keys:
+                    self.memory_cache.pop(key)
             return True
         except Exception as e:
-            print(f"Cache delete error: {e}")
+            logger.error(f"Cache delete_many failed for {len(keys)} keys: {e}")
             return False
 
+    async def delete_namespace(self, namespace: str) -> int:
+        """Delete every key in a namespace (`namespace` itself or `namespace:...`).
+
+        Returns the entries removed; stale copies on Redis are deleted too but not counted.
+        """
+        try:
+            removed = 0
+            if not self._uses_redis or self._tiered:
+                removed = self._drop_local_namespace(namespace)
+            if self._uses_redis:
+                pattern = _escape_glob(namespace)
+                removed = await self._unlink_matching([f"financer:{namespace}"], [f"financer:{pattern}:*"])
+                await self._unlink_matching([f"financer:stale:{namespace}"], [f"financer:stale:{pattern}:*"])
+                if self._tiered:
+                    await self._redis.publish(
+                        INVALIDATION_CHANNEL, self._invalidation_message(None, namespace=namespace)
+                    )
+                    self.invalidations_published += 1
+                    self._invalidation_generation += 1
+            return removed
+        except Exception as e:
+            logger.error(f"Cache delete of namespace {namespace} failed: {e}")
+            return 0
+
+    def _drop_local_namespace(self, namespace: str) -> int:
+        prefix = f"{namespace}:"
+        keys = [key for key in self.memory_cache.keys() if key == namespace or key.startswith(prefix)]
+        for key in keys:
+            self.memory_cache.pop(key)
+        return len(keys)
+
+    async def _index_tags(self, key: str, tags: Tuple[str, ...], ttl: int):
+        """Add a key to each tag's Redis set, extending the set to outlive its longest-lived member.
+
+        Reads TTL and extends only shorter sets, rather than EXPIRE NX/GT which need Redis 7.
+        """
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.sadd(f"financer:tag:{tag}", key)
+                pipe.ttl(f"financer:tag:{tag}")
+            results = await pipe.execute()
+        # -1 is a set that was just created without a TTL
+        short = [tag for tag, remaining in zip(tags, results[1::2]) if remaining < ttl]
+        if short:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for tag in short:
+                    pipe.expire(f"financer:tag:{tag}", ttl)
+                await pipe.execute()
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """Delete every key set with a tag, touching only those keys; returns keys removed"""
+        self._abandon_inflight(tag)
+        try:
+            if not self._uses_redis:
+                return len(self.memory_cache.pop_tag(tag))
+
+            # Read and drop the set atomically so keys tagged meanwhile land in a fresh set
+            tag_key = f"financer:tag:{tag}"
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.smembers(tag_key)
+                pipe.unlink(tag_key)
+                members, _ = await pipe.execute()
+            keys = sorted(member.decode() if isinstance(member, bytes) else member for member in members)
+            if not keys:
+                return 0
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.unlink(*[f"financer:{key}" for key in keys])
+                pipe.unlink(*[f"financer:stale:{key}" for key in keys])
+                if self._tiered:
+                    self._publish_invalidation(pipe, keys=keys)
+                removed = (await pipe.execute())[0]
+            if self._tiered:
+                self._invalidation_generation += 1
+                for key in keys:
+                    self.memory_cache.pop(key)
+            return removed
+        except Exception as e:
+            logger.error(f"Cache invalidation of tag {tag} failed: {e}")
+            return 0
+
+    async def _unlink_matching(self, exact: List[str], patterns: List[str], batch: int = 500) -> int:
+        """UNLINK exact keys and SCAN matches in batches, without blocking Redis like KEYS"""
+        removed = await self._redis.unlink(*exact) if exact else 0
+        for pattern in patterns:
+            pending = []
+            async for key in self._redis.scan_iter(match=pattern, count=batch):
+                pending.append(key)
+                if len(pending) >= batch:
+                    removed += await self._redis.unlink(*pending)
+                    pending = []
+            if pending:
+                removed += await self._redis.unlink(*pending)
+        return removed
+
     async def clear(self) -> bool:
         """Clear all cache items"""
         try:
-            if self.backend == CacheBackend.REDIS and self.redis_client:
+            if self._uses_redis:
                 # Clear all financer prefixed keys
-                keys = await self.redis_client.keys("financer:*")
-                if keys:
-                    await self.redis_client.delete(*keys)
+                await self._unlink_matching([], ["financer:*"])
+                if self._tiered:
+                    await self._redis.publish(INVALIDATION_CHANNEL, self._invalidation_message(None))
+                    self.invalidations_published += 1
+                    self._invalidation_generation += 1
+                    self.memory_cache.clear()
             else:
                 self.memory_cache.clear()
             return True
@@ -117,41 +811,198 @@ class CacheService:
             print(f"Cache clear error: {e}")
             return False
 
+    def _invalidation_message(self, keys: Optional[List[str]], namespace: Optional[str] = None) -> str:
+        """Invalidation payload; no keys and no namespace means every key"""
+        return json.dumps({"origin": self.instance_id, "keys": keys, "namespace": namespace})
+
+    def _publish_invalidation(self, pipe, keys: List[str]):
+        pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys))
+        self.invalidations_published += 1
+
+    def _apply_invalidation(self, data: str):
+        """Drop L1 entries named in another worker's invalidation"""
+        message = json.loads(data)
+        if message.get("origin") == self.instance_id:
+            return
+        self.invalidations_received += 1
+        self._invalidation_generation += 1
+        keys = message.get("keys")
+        if message.get("namespace"):
+            self._drop_local_namespace(message["namespace"])
+        elif keys is None:
+            self.memory_cache.clear()
+        else:
+            for key in keys:
+                self.memory_cache.pop(key)
+
+    async def run_invalidation_listener(self, retry_delay: float = 1.0):
+        """Keep L1 coherent with other workers by following the invalidation channel (tiered backend)"""
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations published while unsubscribed were missed
+                self.memory_cache.clear()
+                self._invalidation_generation += 1
+                self._l1_enabled = True
+                logger.info(f"Cache L1 enabled, following {INVALIDATION_CHANNEL}")
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+            finally:
+                self._l1_enabled = False
+                self.memory_cache.clear()
+                await pubsub.aclose()
+            await asyncio.sleep(retry_delay)
+
     async def get_stats(self) -> dict:
         """Get cache statistics"""
+        single_flight = {
+            "computations": self.computations,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "stale_served": self.stale_served,
+            "revalidations": self.revalidations
+        }
         try:
-            if self.backend == CacheBackend.REDIS and self.redis_client:
-                info = await self.redis_client.info()
-                return {
-                    "backend": "redis",
-                    "keys": await self.redis_client.dbsize(),
-                    "memory_used": info.get("used_memory_human", "N/A")
+            if self._uses_redis:
+                try:
+                    info = await self._redis.info("memory")
+                except Exception:
+                    # Not every Redis-compatible server implements INFO
+                    info = {}
+                stats = {
+                    "backend": self.backend.value,
+                    "keys": await self._redis.dbsize(),
+                    "memory_used": info.get("used_memory_human", "N/A"),
+                    "compression": self.codec.get_stats(),
+                    "single_flight": single_flight,
+                    "namespaces": self.metrics.snapshot()
                 }
+                if self._tiered:
+                    stats["l1"] = {
+                        **self.memory_cache.get_stats(),
+                        "enabled": self._l1_enabled,
+                        "ttl": self.l1_ttl
+                    }
+                    stats["tiers"] = {
+                        "l1_hits": self.l1_hits,
+                        "l2_hits": self.l2_hits,
+                        "misses": self.misses,
+                        "invalidations_published": self.invalidations_published,
+                        "invalidations_received": self.invalidations_received
+                    }
+                return stats
             else:
                 return {
                     "backend": "memory",
-                    "keys": len(self.memory_cache),
-                    "items": list(self.memory_cache.keys())
+                    **self.memory_cache.get_stats(),
+                    "single_flight": single_flight,
+                    "namespaces": self.metrics.snapshot()
                 }
         except Exception as e:
             return {"error": str(e)}
 
-    async def cleanup_expired(self):
+    async def save(self, path: str) -> int:
+        """Write live memory entries to a gzipped JSON-lines file for a warm restart"""
+        if self._uses_redis:
+            # Redis outlives the process
+            return 0
+        now = datetime.utcnow()
+        wall = time.time()
+        lines = [b'{"version":%d,"saved_at":%.3f}' % (WARM_START_VERSION, wall)]
+        # Least recently used first, so loading restores the LRU order
+        for key, item in self.memory_cache.items():
+            if item.reclaim_at <= now:
+                continue
+            payload = item.encoded if item.encoded is not None else encode_json(item.data)
+            expires = wall + (item.expires_at - now).total_seconds()
+            stale = b"%.3f" % (wall + (item.stale_until - now).total_seconds()) if item.stale_until else b"null"
+            lines.append(b'{"k":%s,"e":%.3f,"s":%s,"b":%d,"t":%s,"v":%s}' % (
+                encode_json(key), expires, stale, item.encoded is not None, encode_json(item.tags), payload
+            ))
+        await asyncio.to_thread(self._write_warm_start, path, b"\n".join(lines))
+        return len(lines) - 1
+
+    @staticmethod
+    def _write_warm_start(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_warm_start(path: str) -> List[bytes]:
+        with gzip.open(path, "rb") as f:
+            return f.read().split(b"\n")
+
+    async def load(self, path: str) -> int:
+        """Restore entries written by save() with their remaining TTLs; returns entries loaded"""
+        if self._uses_redis or not os.path.exists(path):
+            return 0
+        try:
+            lines = await asyncio.to_thread(self._read_warm_start, path)
+            header = decode_json(lines[0])
+        except Exception as e:
+            logger.warning(f"Failed to read cache warm-start file {path}: {e}")
+            return 0
+        if header.get("version") != WARM_START_VERSION:
+            logger.warning(f"Ignoring cache warm-start file {path} with version {header.get('version')}")
+            return 0
+
+        wall = time.time()
+        loaded = 0
+        for line in lines[1:]:
+            entry = decode_json(line)
+            expires_in = entry["e"] - wall
+            if max(expires_in, (entry["s"] or 0) - wall) <= 0:
+                continue
+            stale_ttl = entry["s"] - entry["e"] if entry["s"] else 0
+            self._set_local(
+                entry["k"], entry["v"], expires_in, stale_ttl, keep_encoded=bool(entry["b"]), tags=entry.get("t", ())
+            )
+            loaded += 1
+        logger.info(f"Restored {loaded} cache entries from {path} saved {wall - header['saved_at']:.0f}s ago")
+        return loaded
+
+    def render_metrics(self) -> str:
+        """Prometheus text exposition of per-namespace counters, latencies and store gauges"""
+        store = self.memory_cache
+        return self.metrics.render_prometheus() + "\n".join([
+            "# TYPE financer_cache_resident_bytes gauge",
+            f"financer_cache_resident_bytes {store.bytes}",
+            "# TYPE financer_cache_resident_keys gauge",
+            f"financer_cache_resident_keys {len(store)}",
+            ""
+        ])
+
+    async def cleanup_expired(self) -> int:
         """Clean up expired memory cache items (run periodically)"""
-        if self.backend == CacheBackend.MEMORY:
-            current_time = datetime.utcnow()
-            expired_keys = [
-                key for key, item in self.memory_cache.items()
-                if current_time >= item.expires_at
-            ]
-            for key in expired_keys:
-                del self.memory_cache[key]
+        if self._uses_redis and not self._tiered:
+            return 0
+        return self.memory_cache.reclaim()
+
+    async def run_reclaimer(self, interval: float = 30.0):
+        """Reclaim expired memory cache items every `interval` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.cleanup_expired()
+                if removed:
+                    logger.debug(f"Reclaimed {removed} expired cache items")
+            except Exception as e:
+                logger.error(f"Cache reclaimer error: {e}")
 
     async def health_check(self) -> bool:
         """Check if cache service is healthy"""
         try:
-            if self.backend == CacheBackend.REDIS and self.redis_client:
-                await self.redis_client.ping()
+            if self._uses_redis:
+                await self._redis.ping()
             return True
         except Exception:
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,114 @@
+"""
+Compression of cached values stored in Redis.
+"""
+
+import logging
+import time
+import zlib
+from typing import Any, Callable, Dict, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+# Compressed values start with MAGIC and a codec id byte. JSON text never starts with NUL,
+# so values written before compression existed still read back as plain JSON.
+MAGIC = b"\x00FC"
+
+CODEC_IDS = {"zstd": b"z", "lz4": b"l", "zlib": b"d"}
+
+
+def _codecs() -> Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    """(compress, decompress) for every algorithm importable here"""
+    codecs: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+        "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress)
+    }
+    if lz4_frame is not None:
+        codecs["lz4"] = (lz4_frame.compress, lz4_frame.decompress)
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=3)
+        decompressor = zstandard.ZstdDecompressor()
+        codecs["zstd"] = (compressor.compress, decompressor.decompress)
+    return codecs
+
+
+class ValueCodec:
+    """Compress payloads above a size threshold behind a self-describing header"""
+
+    def __init__(self, min_bytes: int = 1024, algorithm: str = "auto"):
+        self.min_bytes = min_bytes
+        self._codecs = _codecs()
+        if algorithm == "auto":
+            algorithm = next(name for name in ("zstd", "lz4", "zlib") if name in self._codecs)
+        elif algorithm != "none" and algorithm not in self._codecs:
+            logger.warning(f"Cache compression '{algorithm}' is not installed, using zlib")
+            algorithm = "zlib"
+        self.algorithm = algorithm
+        self._by_id = {CODEC_IDS[name]: codec for name, codec in self._codecs.items()}
+
+        self.compressed = 0
+        self.stored_plain = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.decoded = 0
+        self._attempts = 0
+        self._encode_time = 0.0
+        self._decode_time = 0.0
+
+    def encode(self, payload: bytes) -> bytes:
+        """Value to store in Redis for the given JSON bytes"""
+        if self.algorithm == "none" or len(payload) < self.min_bytes:
+            self.stored_plain += 1
+            return payload
+
+        self._attempts += 1
+        start = time.perf_counter()
+        compress, _ = self._codecs[self.algorithm]
+        data = MAGIC + CODEC_IDS[self.algorithm] + compress(payload)
+        self._encode_time += time.perf_counter() - start
+        if len(data) >= len(payload):
+            # Incompressible; not worth the decode cost
+            self.stored_plain += 1
+            return payload
+
+        self.compressed += 1
+        self.bytes_in += len(payload)
+        self.bytes_out += len(data)
+        return data
+
+    def decode(self, data: Union[bytes, str]) -> bytes:
+        """JSON bytes for a value read from Redis, compressed or not"""
+        if isinstance(data, str):
+            return data.encode()
+        if not data.startswith(MAGIC):
+            return data
+
+        start = time.perf_counter()
+        codec = self._by_id.get(data[len(MAGIC):len(MAGIC) + 1])
+        if codec is None:
+            raise ValueError(f"Cached value uses an unavailable codec {data[len(MAGIC):len(MAGIC) + 1]!r}")
+        payload = codec[1](data[len(MAGIC) + 1:])
+        self._decode_time += time.perf_counter() - start
+        self.decoded += 1
+        return payload
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compression ratio and encode/decode cost"""
+        return {
+            "algorithm": self.algorithm,
+            "min_bytes": self.min_bytes,
+            "compressed": self.compressed,
+            "stored_plain": self.stored_plain,
+            "ratio": round(self.bytes_in / self.bytes_out, 2) if self.bytes_out else None,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "avg_encode_ms": round(self._encode_time / self._attempts * 1000, 3) if self._attempts else 0.0,
+            "avg_decode_ms": round(self._decode_time / self.decoded * 1000, 3) if self.decoded else 0.0
+        }
@@ -0,0 +1,116 @@
+"""
+Per-namespace cache counters and latency histograms.
+"""
+
+import logging
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ("hits", "misses", "stale", "sets", "evictions", "expirations")
+
+# Upper bounds in seconds; one more bucket catches everything slower
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def key_namespace(key: str) -> str:
+    """Namespace of a `namespace:rest` cache key; a key without a colon is its own namespace"""
+    return key.partition(":")[0]
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram, cheap enough to update on every cache call"""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation, in seconds"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class CacheMetrics:
+    """Hit, miss, stale, set and eviction counts plus latency histograms by key namespace"""
+
+    def __init__(self, max_namespaces: int = 64):
+        # Keys outside the known namespaces must not grow the label set without bound
+        self.max_namespaces = max_namespaces
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.latency: Dict[Tuple[str, str], LatencyHistogram] = {}
+
+    def _namespace(self, key: str) -> str:
+        namespace = key_namespace(key)
+        if namespace not in self.counters:
+            if len(self.counters) >= self.max_namespaces:
+                namespace = "other"
+                if namespace in self.counters:
+                    return namespace
+            self.counters[namespace] = dict.fromkeys(EVENTS, 0)
+        return namespace
+
+    def count(self, key: str, event: str, amount: int = 1):
+        """Add to an event counter for the key's namespace"""
+        self.counters[self._namespace(key)][event] += amount
+
+    def observe(self, key: str, operation: str, seconds: float):
+        """Record how long a get or set took for the key's namespace"""
+        label = (self._namespace(key), operation)
+        histogram = self.latency.get(label)
+        if histogram is None:
+            histogram = self.latency[label] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters, hit ratio and latency summary per namespace"""
+        result: Dict[str, Any] = {}
+        for namespace, counters in self.counters.items():
+            lookups = counters["hits"] + counters["misses"]
+            result[namespace] = {
+                **counters,
+                "hit_ratio": round(counters["hits"] / lookups, 3) if lookups else None,
+                "latency_ms": {}
+            }
+        for (namespace, operation), histogram in self.latency.items():
+            result[namespace]["latency_ms"][operation] = {
+                "count": histogram.count,
+                "avg": round(histogram.total / histogram.count * 1000, 3) if histogram.count else 0.0,
+                "p50": histogram.quantile(0.5) * 1000,
+                "p99": histogram.quantile(0.99) * 1000
+            }
+        return result
+
+    def render_prometheus(self, prefix: str = "financer_cache") -> str:
+        """Prometheus text exposition of every counter and histogram"""
+        lines: List[str] = []
+        for event in EVENTS:
+            lines.append(f"# TYPE {prefix}_{event}_total counter")
+            for namespace, counters in self.counters.items():
+                lines.append(f'{prefix}_{event}_total{{namespace="{namespace}"}} {counters[event]}')
+
+        lines.append(f"# TYPE {prefix}_operation_seconds histogram")
+        for (namespace, operation), histogram in self.latency.items():
+            labels = f'namespace="{namespace}",operation="{operation}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_operation_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_operation_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{prefix}_operation_seconds_sum{{{labels}}} {histogram.total:.6f}")
+            lines.append(f"{prefix}_operation_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
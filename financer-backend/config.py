@@ -4,7 +4,7 @@ Application configuration management.
 
 import os
 from typing import List, Optional
-from pydantic import BaseSettings, validator
+from pydantic.v1 import BaseSettings, validator
 
 
 class Settings(BaseSettings):
@@ -39,6 +39,14 @@ class Settings(BaseSettings):
     # Redis
     redis_url: Optional[str] = None
     cache_ttl: int = 300  # 5 minutes
+    cache_backend: str = "memory"  # memory, redis, tiered (per-process L1 in front of Redis)
+    cache_l1_ttl: float = 5.0  # upper bound on L1 staleness if an invalidation is missed
+    cache_compression: str = "auto"  # auto, zstd, lz4, zlib, none (Redis values)
+    cache_compress_min_bytes: int = 1024
+    cache_max_entries: int = 10000  # in-process cache bounds, LRU evicted
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_reclaim_interval: float = 30.0  # seconds between expired-entry sweeps
+    cache_warm_start_path: str = "data/cache_warm_start.jsonl.gz"  # empty to disable
 
     # Firebase
     firebase_api_key: Optional[str] = None
@@ -61,6 +69,30 @@ class Settings(BaseSettings):
     nse_api_base: str = "https://www.nseindia.com/api"
     nse_request_timeout: int = 15
     nse_rate_limit_interval: float = 1.0
+    market_snapshot_interval: int = 60  # seconds between universe refreshes
+    ticker_master_path: str = "data/nse_equity_master.csv.gz"
+    trading_holidays_path: str = "data/nse_holidays.csv"
+    market_closed_max_ttl: int = 86400  # cap on TTLs and refresh delays while the market is closed
+    history_dir: str = "data/history"
+    history_backfill_years: int = 5
+    upstream_max_workers: int = 8
+    upstream_max_queue: int = 32
+    upstream_timeout: float = 30.0  # seconds per blocking upstream call
+    upstream_rate_limit: float = 2.0  # market data calls per second, 0 to disable
+    upstream_burst: int = 4
+    quote_stream_interval: float = 5.0  # seconds between live quote polls
+    quote_stream_queue_size: int = 32
+    quote_stream_max_symbols: int = 50
+    market_data_provider: str = "yfinance"  # yfinance, replay, record
+    replay_dir: str = "data/recordings"
+    replay_latency_ms: float = 0.0
+    replay_jitter_ms: float = 0.0
+    replay_error_rate: float = 0.0  # share of replayed calls that fail
+    replay_seed: int = 42
+    circuit_failure_threshold: int = 5  # consecutive failures before the circuit opens
+    circuit_reset_timeout: float = 30.0  # seconds before a half-open probe
+    circuit_half_open_calls: int = 1
+    cache_stale_ttl: int = 900  # seconds a value may be served stale after its TTL
 
     # Rate Limiting
     rate_limit_requests: int = 100
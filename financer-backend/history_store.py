@@ -0,0 +1,139 @@
+"""
+Append-only columnar OHLCV history store backed by memory-mapped NumPy files.
+"""
+
+import logging
+import os
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Dates are stored as int64 days since the epoch and viewed as datetime64[D]
+COLUMNS = {
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.int64,
+    "date": np.int64,
+}
+
+
+def _to_day(value: date) -> int:
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def dates_to_list(dates: np.ndarray) -> list:
+    """ISO date strings for a datetime64 column"""
+    return np.datetime_as_string(dates, unit="D").tolist()
+
+
+def bars_to_lists(bars: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """Convert column arrays to JSON-ready lists with ISO dates"""
+    result = {"date": dates_to_list(bars["date"])}
+    for column in ("open", "high", "low", "close", "volume"):
+        result[column] = bars[column].tolist()
+    return result
+
+
+class HistoryStore:
+    """Per-symbol directories holding one raw binary file per OHLCV column"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol: str, column: str) -> str:
+        symbol = symbol.upper()
+        if symbol in ("", ".", "..") or "/" in symbol or os.sep in symbol:
+            raise ValueError(f"Invalid symbol for history store: {symbol!r}")
+        return os.path.join(self.root, symbol, f"{column}.bin")
+
+    def _map(self, symbol: str, column: str, rows: Optional[int] = None) -> np.ndarray:
+        """Read-only memory map of one column (empty if the symbol has no history)"""
+        path = self._path(symbol, column)
+        dtype = np.dtype(COLUMNS[column])
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        available = size // dtype.itemsize
+        rows = available if rows is None else min(rows, available)
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def _dates(self, symbol: str) -> np.ndarray:
+        # The date column is written last, so its length is the committed row count
+        return self._map(symbol, "date")
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        """Most recent stored bar date"""
+        dates = self._dates(symbol)
+        return dates[-1].astype("datetime64[D]").item() if len(dates) else None
+
+    def append(self, symbol: str, columns: Dict[str, np.ndarray]) -> int:
+        """Append bars newer than the last stored date; returns rows written"""
+        dates = np.asarray(columns["date"]).astype("datetime64[D]").astype(np.int64)
+        order = np.argsort(dates, kind="stable")
+        dates = dates[order]
+
+        stored = self._dates(symbol)
+        committed = len(stored)
+        keep = dates > stored[-1] if committed else np.ones(len(dates), dtype=bool)
+        # Drop duplicate dates within the batch as well
+        keep[1:] &= dates[1:] != dates[:-1]
+        if not keep.any():
+            return 0
+
+        os.makedirs(os.path.dirname(self._path(symbol, "date")), exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            path = self._path(symbol, column)
+            values = dates if column == "date" else np.asarray(columns[column])[order]
+            values = np.nan_to_num(values, nan=0).astype(dtype) if column == "volume" else values.astype(dtype)
+            with open(path, "ab") as f:
+                # Trim rows left behind by an interrupted append before writing
+                f.truncate(committed * np.dtype(dtype).itemsize)
+                values[keep].tofile(f)
+        return int(keep.sum())
+
+    def read(
+        self,
+        symbol: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        interval: str = "1d"
+    ) -> Dict[str, np.ndarray]:
+        """Return column views for [start, end]; daily reads are zero-copy slices of the maps"""
+        dates = self._dates(symbol)
+        lo = int(np.searchsorted(dates, _to_day(start), side="left")) if start else 0
+        hi = int(np.searchsorted(dates, _to_day(end), side="right")) if end else len(dates)
+
+        result = {"date": dates[lo:hi].view("datetime64[D]")}
+        for column in ("open", "high", "low", "close", "volume"):
+            result[column] = self._map(symbol, column, len(dates))[lo:hi]
+
+        if interval == "1d" or hi <= lo:
+            return result
+        return self._resample(result, interval)
+
+    @staticmethod
+    def _resample(bars: Dict[str, np.ndarray], interval: str) -> Dict[str, np.ndarray]:
+        """Aggregate daily bars to weekly or monthly bars in one vectorized pass"""
+        dates = bars["date"]
+        if interval == "1wk":
+            # Epoch day 0 is a Thursday; shift so buckets start on Monday
+            buckets = (dates.astype(np.int64) + 3) // 7
+        else:
+            buckets = dates.astype("datetime64[M]").astype(np.int64)
+
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(dates)] - 1
+        return {
+            "date": dates[starts],
+            "open": bars["open"][starts],
+            "high": np.maximum.reduceat(bars["high"], starts),
+            "low": np.minimum.reduceat(bars["low"], starts),
+            "close": bars["close"][ends],
+            "volume": np.add.reduceat(bars["volume"], starts),
+        }
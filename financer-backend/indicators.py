@@ -0,0 +1,275 @@
+"""
+Vectorized technical indicators over OHLCV column arrays, with incremental caching.
+"""
+
+import logging
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+Bars = Dict[str, np.ndarray]
+Outputs = Dict[str, np.ndarray]
+
+MAX_WINDOW = 500
+MAX_INDICATORS = 10
+
+
+def _nan(length: int) -> np.ndarray:
+    return np.full(length, np.nan)
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing window sums, NaN until the window is full"""
+    out = _nan(len(values))
+    if len(values) >= window:
+        sums = np.cumsum(np.r_[0.0, values])
+        out[window - 1:] = sums[window:] - sums[:-window]
+    return out
+
+
+def _ewm(values: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """Recursive smoothing y[t] = alpha * x[t] + (1 - alpha) * y[t-1] starting from seed"""
+    if len(values) == 0:
+        return np.empty(0)
+    # pandas runs the recursion in compiled code; the seed row is dropped again
+    return pd.Series(np.r_[seed, values]).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def _ema(values: np.ndarray, window: int, seed: Optional[float]) -> Tuple[np.ndarray, Optional[float]]:
+    """EMA seeded with the SMA of the first full window, or continued from a previous value"""
+    alpha = 2 / (window + 1)
+    if seed is not None:
+        out = _ewm(values, alpha, seed)
+    else:
+        out = _nan(len(values))
+        finite = np.flatnonzero(np.isfinite(values))
+        first = finite[0] if len(finite) else len(values)
+        if len(values) - first >= window:
+            start = first + window - 1
+            out[start] = values[first:start + 1].mean()
+            out[start + 1:] = _ewm(values[start + 1:], alpha, out[start])
+    last = out[-1] if len(out) else np.nan
+    return out, (float(last) if np.isfinite(last) else None)
+
+
+def sma(bars: Bars, params: Tuple, state: Any) -> Tuple[Outputs, Any]:
+    (window,) = params
+    return {"value": _rolling_sum(bars["close"], window) / window}, None
+
+
+def ema(bars: Bars, params: Tuple, state: Any) -> Tuple[Outputs, Any]:
+    (window,) = params
+    value, last = _ema(bars["close"], window, state)
+    return {"value": value}, last
+
+
+def rsi(bars: Bars, params: Tuple, state: Any) -> Tuple[Outputs, Any]:
+    """Wilder's RSI; state is the last (average gain, average loss)"""
+    (window,) = params
+    close = bars["close"]
+    out = _nan(len(close))
+    diff = np.diff(close)
+    gains = np.clip(diff, 0, None)
+    losses = np.clip(-diff, 0, None)
+
+    if state is not None:
+        avg_gain = _ewm(gains, 1 / window, state[0])
+        avg_loss = _ewm(losses, 1 / window, state[1])
+        offset = 1
+    elif len(diff) >= window:
+        avg_gain = _ewm(gains[window:], 1 / window, gains[:window].mean())
+        avg_loss = _ewm(losses[window:], 1 / window, losses[:window].mean())
+        avg_gain = np.r_[gains[:window].mean(), avg_gain]
+        avg_loss = np.r_[losses[:window].mean(), avg_loss]
+        offset = window
+    else:
+        return {"value": out}, None
+
+    safe_loss = np.where(avg_loss == 0, 1, avg_loss)
+    out[offset:] = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / safe_loss))
+    return {"value": out}, (float(avg_gain[-1]), float(avg_loss[-1]))
+
+
+def macd(bars: Bars, params: Tuple, state: Any) -> Tuple[Outputs, Any]:
+    """MACD line, signal line and histogram; state is the last (fast, slow, signal) EMAs"""
+    fast, slow, signal = params
+    fast_seed, slow_seed, signal_seed = state or (None, None, None)
+    fast_ema, fast_last = _ema(bars["close"], fast, fast_seed)
+    slow_ema, slow_last = _ema(bars["close"], slow, slow_seed)
+    line = fast_ema - slow_ema
+    signal_line, signal_last = _ema(line, signal, signal_seed)
+
+    lasts = (fast_last, slow_last, signal_last)
+    return (
+        {"macd": line, "signal": signal_line, "histogram": line - signal_line},
+        lasts if None not in lasts else None
+    )
+
+
+def bollinger(bars: Bars, params: Tuple, state: Any) -> Tuple[Outputs, Any]:
+    window, width = params
+    close = bars["close"]
+    middle = _rolling_sum(close, window) / window
+    std = _nan(len(close))
+    if len(close) >= window:
+        std[window - 1:] = np.lib.stride_tricks.sliding_window_view(close, window).std(axis=1)
+    return {"middle": middle, "upper": middle + width * std, "lower": middle - width * std}, None
+
+
+def vwap(bars: Bars, params: Tuple, state: Any) -> Tuple[Outputs, Any]:
+    """Rolling VWAP of the typical price over daily bars"""
+    (window,) = params
+    typical = (bars["high"] + bars["low"] + bars["close"]) / 3
+    volume = np.asarray(bars["volume"], dtype=np.float64)
+    traded = _rolling_sum(typical * volume, window)
+    total = _rolling_sum(volume, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"value": np.where(total > 0, traded / total, np.nan)}, None
+
+
+@dataclass(frozen=True)
+class Indicator:
+    """Registry entry: compute function, default params and incremental behaviour"""
+    compute: Callable[[Bars, Tuple, Any], Tuple[Outputs, Any]]
+    defaults: Tuple
+    # Rows of history before the first new bar that a recompute needs
+    lookback: Callable[[Tuple], int]
+    # Recursive indicators continue from saved state instead of a window
+    recursive: bool = False
+
+
+INDICATORS: Dict[str, Indicator] = {
+    "sma": Indicator(sma, (20,), lambda p: p[0] - 1),
+    "ema": Indicator(ema, (20,), lambda p: 0, recursive=True),
+    "rsi": Indicator(rsi, (14,), lambda p: 1, recursive=True),
+    "macd": Indicator(macd, (12, 26, 9), lambda p: 0, recursive=True),
+    "bb": Indicator(bollinger, (20, 2.0), lambda p: p[0] - 1),
+    "vwap": Indicator(vwap, (20,), lambda p: p[0] - 1),
+}
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """One requested indicator with resolved parameters"""
+    name: str
+    params: Tuple
+
+    @property
+    def label(self) -> str:
+        return "_".join([self.name] + [f"{p:g}" for p in self.params])
+
+
+def parse_indicator_set(text: str) -> List[IndicatorSpec]:
+    """Parse 'sma:20,rsi:14,macd:12:26:9' into specs, filling defaults for omitted params"""
+    specs = []
+    for item in filter(None, (part.strip().lower() for part in text.split(","))):
+        name, *raw = item.split(":")
+        indicator = INDICATORS.get(name)
+        if indicator is None:
+            raise ValueError(f"Unknown indicator '{name}'")
+        if len(raw) > len(indicator.defaults):
+            raise ValueError(f"Too many parameters for '{name}'")
+
+        params = list(indicator.defaults)
+        for i, value in enumerate(raw):
+            try:
+                params[i] = type(indicator.defaults[i])(value)
+            except ValueError:
+                raise ValueError(f"Invalid parameter '{value}' for '{name}'")
+        windows = [p for p in params if isinstance(p, int)]
+        if any(p < 1 or p > MAX_WINDOW for p in windows):
+            raise ValueError(f"Windows for '{name}' must be between 1 and {MAX_WINDOW}")
+        if any(p <= 0 for p in params):
+            raise ValueError(f"Parameters for '{name}' must be positive")
+        if name == "macd" and params[0] >= params[1]:
+            raise ValueError("MACD fast period must be shorter than the slow period")
+
+        spec = IndicatorSpec(name, tuple(params))
+        if spec not in specs:
+            specs.append(spec)
+
+    if not specs:
+        raise ValueError("No indicators requested")
+    if len(specs) > MAX_INDICATORS:
+        raise ValueError(f"At most {MAX_INDICATORS} indicators per request")
+    return specs
+
+
+def series_to_list(values: np.ndarray, digits: int = 4) -> List[Optional[float]]:
+    """JSON-ready list with NaN warm-up rows as None"""
+    return [None if math.isnan(v) else v for v in np.round(values, digits).tolist()]
+
+
+@dataclass
+class _Entry:
+    last_date: np.datetime64
+    rows: int
+    outputs: Outputs
+    state: Any
+
+
+class IndicatorEngine:
+    """Compute indicators over full daily history, reusing results until a new bar arrives"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[str, IndicatorSpec], _Entry]" = OrderedDict()
+        self.hits = 0
+        self.incremental = 0
+        self.full = 0
+
+    def compute(self, symbol: str, spec: IndicatorSpec, bars: Bars) -> Outputs:
+        """Indicator outputs aligned with bars['date']"""
+        indicator = INDICATORS[spec.name]
+        dates = bars["date"]
+        rows = len(dates)
+        key = (symbol, spec)
+        entry = self._cache.get(key)
+
+        if rows == 0:
+            outputs, _ = indicator.compute(bars, spec.params, None)
+            return outputs
+
+        if entry and entry.rows == rows and entry.last_date == dates[-1]:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return entry.outputs
+
+        extendable = (
+            entry is not None
+            and entry.rows < rows
+            and dates[entry.rows - 1] == entry.last_date
+            and (entry.state is not None or not indicator.recursive)
+        )
+        if extendable:
+            # Only the new bars plus the trailing window they depend on are recomputed
+            start = max(entry.rows - indicator.lookback(spec.params), 0)
+            tail = {column: values[start:] for column, values in bars.items()}
+            fresh, state = indicator.compute(tail, spec.params, entry.state)
+            added = rows - entry.rows
+            outputs = {name: np.concatenate([entry.outputs[name], fresh[name][-added:]]) for name in fresh}
+            self.incremental += 1
+        else:
+            outputs, state = indicator.compute(bars, spec.params, None)
+            self.full += 1
+
+        self._cache[key] = _Entry(dates[-1], rows, outputs, state)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return outputs
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache entries and how results were produced"""
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "incremental": self.incremental,
+            "full": self.full
+        }
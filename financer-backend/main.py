@@ -4,17 +4,19 @@ A comprehensive FastAPI-based backend for financial data and AI insights.
 """
 
 import os
+import json
+import time
 import logging
 import asyncio
 from contextlib import asynccontextmanager
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Optional, Dict, Any, List
-from functools import lru_cache
+from functools import lru_cache, partial
 
-from fastapi import FastAPI, HTTPException, Request, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Depends, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -32,8 +34,13 @@ from models import (
     UserProfile, PortfolioData, FDCalculatorRequest
 )
 from nse_data import NSEDataService
-from cache import CacheService
+from cache import CacheBackend, CacheService
 from database import DatabaseService
+from history_store import bars_to_lists, dates_to_list
+from indicators import parse_indicator_set, series_to_list
+from upstream import CircuitOpenError
+from snapshot_index import parse_fields
+from config import settings
 
 # Load environment variables
 load_dotenv()
@@ -50,7 +57,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Initialize services
-cache_service = CacheService()
+cache_service = CacheService(
+    backend=CacheBackend(settings.cache_backend),
+    max_entries=settings.cache_max_entries,
+    max_bytes=settings.cache_max_bytes,
+    l1_ttl=settings.cache_l1_ttl,
+    compress_min_bytes=settings.cache_compress_min_bytes,
+    compression=settings.cache_compression
+)
 db_service = DatabaseService()
 nse_service = NSEDataService()
 
@@ -116,12 +130,52 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Database connection failed: {e}")
 
+    # Reload the cache and last market snapshot saved at the previous shutdown
+    warm_start_path = None
+    if settings.cache_warm_start_path:
+        warm_start_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), settings.cache_warm_start_path)
+        try:
+            await cache_service.load(warm_start_path)
+            saved_snapshot = await cache_service.get("market_snapshot")
+            if saved_snapshot:
+                nse_service.restore_snapshot(saved_snapshot)
+        except Exception as e:
+            logger.warning(f"Cache warm start failed: {e}")
+
+    snapshot_task = asyncio.create_task(
+        nse_service.run_snapshot_refresher(settings.market_snapshot_interval)
+    )
+    stream_task = asyncio.create_task(nse_service.quote_stream.run())
+    reclaim_task = asyncio.create_task(cache_service.run_reclaimer(settings.cache_reclaim_interval))
+    background_tasks = [snapshot_task, stream_task, reclaim_task]
+    if cache_service.backend == CacheBackend.TIERED:
+        background_tasks.append(asyncio.create_task(cache_service.run_invalidation_listener()))
+
     logger.info("Financer API startup complete")
 
     yield
 
     # Shutdown
     logger.info("Shutting down Financer API...")
+    for task in background_tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if warm_start_path:
+        try:
+            saved_snapshot = nse_service.export_snapshot()
+            if saved_snapshot:
+                await cache_service.set(
+                    "market_snapshot", saved_snapshot, ttl=market_ttl(settings.market_snapshot_interval)
+                )
+            saved = await cache_service.save(warm_start_path)
+            logger.info(f"Saved {saved} cache entries to {warm_start_path}")
+        except Exception as e:
+            logger.warning(f"Cache warm-start save failed: {e}")
+    nse_service.executor.shutdown()
+    await nse_service.close()
     try:
         await db_service.disconnect()
         logger.info("Database disconnected successfully")
@@ -162,6 +216,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Security
@@ -184,9 +239,28 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "market": nse_service.calendar.get_status(),
+        "market_snapshot": nse_service.get_snapshot_stats(),
+        "upstream_executor": nse_service.executor.get_stats(),
+        "upstream_scheduler": nse_service.scheduler.get_stats(),
+        "ticker_index": nse_service.ticker_index.get_stats(),
+        "quote_stream": nse_service.quote_stream.get_stats(),
+        "indicators": nse_service.indicators.get_stats(),
+        "movers": nse_service.movers.get_stats(),
+        "circuit_breakers": [
+            nse_service.universe_breaker.get_stats(),
+            nse_service.breaker.get_stats(),
+            nse_service.index_breaker.get_stats()
+        ],
+        "cache": await cache_service.get_stats()
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Cache metrics in Prometheus text format"""
+    return PlainTextResponse(cache_service.render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/auth/signup", response_model=Dict[str, str])
 @limiter.limit("5/minute")
 async def create_account(request: Request, user_data: SignUpSchema):
@@ -243,6 +317,17 @@ async def verify_token(current_user: dict = Depends(get_current_user)):
         "email_verified": current_user.get("email_verified", False)
     }
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def market_ttl(active_ttl: int) -> int:
+    """Cache TTL of `active_ttl` during NSE sessions, running to the next pre-open when closed"""
+    return nse_service.calendar.cache_ttl(active_ttl, max_ttl=settings.market_closed_max_ttl)
+
 async def get_mock_stock_data() -> Dict[str, Any]:
     """Return mock stock data for development/testing"""
     from datetime import datetime
@@ -460,37 +545,55 @@ async def get_stocks(
     request: Request, 
     background_tasks: BackgroundTasks,
     skip: int = 0,
-    limit: int = 20
+    limit: int = 20,
+    since: Optional[int] = None,
+    sort: Optional[str] = Query(None, pattern="^(pChange|volume|price)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    sector: Optional[str] = None,
+    min_price: Optional[float] = None,
+    fields: Optional[str] = None
 ):
-    """Get NSE stock data with caching and pagination"""
+    """Get NSE stock data as a page of the background market snapshot"""
     try:
-        # Check cache first
-        cache_key = f"nse_stocks_data_{skip}_{limit}"
-        cached_data = await cache_service.get(cache_key)
-
-        if cached_data:
-            logger.info(f"Serving cached stock data for skip={skip} limit={limit}")
-            return cached_data
-
-        # Try to fetch fresh data
-        logger.info(f"Fetching fresh stock data from NSE for skip={skip} limit={limit}")
-        result = await nse_service.get_stock_data(skip=skip, limit=limit)
+        field_list = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        if result["error"]:
-            # Return mock data if NSE fails (only for first page maybe?)
+    try:
+        if nse_service.snapshot.generation == 0:
+            # First refresh has not landed yet
             if skip == 0:
-                logger.warning(f"NSE API error: {result['error']}, serving mock data")
-                mock_data = await get_mock_stock_data()
-                # Cache mock data for shorter time
-                await cache_service.set(cache_key, mock_data, ttl=60)  # 1 minute
-                return mock_data
-            else:
-                return result
+                logger.warning("Market snapshot not loaded yet, serving mock data")
+                return await get_mock_stock_data()
+            return {
+                "data": [],
+                "error": "Market snapshot not loaded yet",
+                "timestamp": datetime.utcnow().isoformat(),
+                "total_count": 0,
+                "has_more": False
+            }
 
-        # Cache the result
-        await cache_service.set(cache_key, result, ttl=300)  # 5 minutes
+        etag = nse_service.snapshot_etag(request.url.query)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
 
-        return result
+        if since is not None:
+            # Delta mode: only quotes whose price or volume moved after `since`
+            build = partial(nse_service.get_snapshot_changes, since, fields=field_list)
+        else:
+            build = partial(
+                nse_service.get_snapshot_page,
+                skip=skip,
+                limit=limit,
+                sort=sort,
+                order=order,
+                sector=sector,
+                min_price=min_price,
+                fields=field_list
+            )
+        # Repeat queries within a generation reuse the encoded body as-is
+        body = nse_service.get_encoded_snapshot_response(request.url.query, build)
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
     except Exception as e:
         logger.error(f"Error in get_stocks: {str(e)}")
@@ -498,38 +601,225 @@ async def get_stocks(
             return await get_mock_stock_data()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/stocks/search", response_model=Dict[str, Any])
+@limiter.limit("120/minute")
+async def search_stocks(request: Request, q: str, limit: int = 10):
+    """Search NSE equities by symbol or company name"""
+    start = time.perf_counter()
+    results = nse_service.search_tickers(q, limit=min(max(limit, 1), 50))
+    return {
+        "query": q,
+        "results": results,
+        "count": len(results),
+        "took_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+@app.get("/stocks/movers", response_model=Dict[str, Any])
+@limiter.limit("120/minute")
+async def get_stock_movers(
+    request: Request,
+    by: str = Query("gainers", pattern="^(gainers|losers|volume)$"),
+    k: int = Query(10, ge=1),
+    sector: Optional[str] = None
+):
+    """Get top gainers, losers or most active stocks, optionally within a sector"""
+    return nse_service.get_movers(by, min(k, nse_service.movers.depth), sector)
+
+@app.get("/stocks/compare", response_model=Dict[str, Any])
+@limiter.limit("30/minute")
+async def compare_stocks(
+    request: Request,
+    symbols: str,
+    period: str = Query("1y", pattern="^(1mo|3mo|6mo|1y|2y|5y)$")
+):
+    """Compare returns, correlation, volatility and drawdown across stocks"""
+    wanted = sorted({s.strip().upper() for s in symbols.split(",") if s.strip()})
+    if not 2 <= len(wanted) <= 10:
+        raise HTTPException(status_code=400, detail="Compare between 2 and 10 symbols")
+    unknown = [symbol for symbol in wanted if not nse_service.is_known_symbol(symbol)]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown symbols: {','.join(unknown)}")
+
+    try:
+        # Sorted key so A,B and B,A share one cache entry
+        result = await cache_service.get_or_compute(
+            f"stock_compare:{','.join(wanted)}:{period}",
+            lambda: nse_service.compare_stocks(wanted, period),
+            ttl=market_ttl(60),
+            stale_ttl=settings.cache_stale_ttl,
+            tags=[f"symbol:{s}" for s in wanted]
+        )
+        if not result:
+            raise HTTPException(status_code=404, detail="Not enough price data to compare")
         return result
 
+    except HTTPException:
+        raise
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Market data temporarily unavailable")
     except Exception as e:
-        logger.error(f"Stock data fetch failed: {e}")
-        # Return mock data as fallback
-        logger.info("Serving mock stock data due to error")
-        return await get_mock_stock_data()
+        logger.error(f"Stock comparison failed for {wanted}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compare stocks")
+
+@app.get("/stocks/stream")
+@limiter.limit("30/minute")
+async def stream_stocks(request: Request, symbols: str):
+    """Stream live quotes for comma-separated symbols as server-sent events"""
+    wanted = sorted({s.strip().upper() for s in symbols.split(",") if s.strip()})
+    if not wanted:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(wanted) > settings.quote_stream_max_symbols:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.quote_stream_max_symbols} symbols per stream"
+        )
+    unknown = [symbol for symbol in wanted if not nse_service.is_known_symbol(symbol)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown symbols: {','.join(unknown)}")
+
+    subscriber = nse_service.quote_stream.subscribe(wanted)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                if frame is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    break
+                yield f"id: {frame['sequence']}\nevent: quotes\ndata: {json.dumps(frame)}\n\n"
+        finally:
+            nse_service.quote_stream.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@app.get("/stocks/{symbol}", response_model=StockData)
+@app.get("/stocks/{symbol}/history", response_model=Dict[str, Any])
 @limiter.limit("60/minute")
-async def get_stock_detail(request: Request, symbol: str):
-    """Get detailed information for a specific stock"""
+async def get_stock_history(
+    request: Request,
+    symbol: str,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    interval: str = Query("1d", pattern="^(1d|1wk|1mo)$")
+):
+    """Get OHLCV history for a stock from the local history store"""
+    symbol = symbol.strip().upper()
+    if not nse_service.is_known_symbol(symbol):
+        raise HTTPException(status_code=404, detail="Stock not found")
+
+    try:
+        bars = await nse_service.get_history(symbol, start, end, interval)
+        if nse_service.history.last_date(symbol) is None:
+            raise HTTPException(status_code=404, detail="No history for symbol")
+
+        return {
+            "symbol": symbol.upper(),
+            "interval": interval,
+            "count": len(bars["date"]),
+            **bars_to_lists(bars)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"History fetch failed for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch stock history")
+
+@app.get("/stocks/{symbol}/indicators", response_model=Dict[str, Any])
+@limiter.limit("60/minute")
+async def get_stock_indicators(
+    request: Request,
+    symbol: str,
+    indicator_set: str = Query("sma:20,ema:50,rsi:14,macd", alias="set"),
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to")
+):
+    """Get technical indicators computed from the stock's daily history"""
+    symbol = symbol.strip().upper()
+    if not nse_service.is_known_symbol(symbol):
+        raise HTTPException(status_code=404, detail="Stock not found")
+
     try:
-        cache_key = f"stock_detail_{symbol}"
-        cached_data = await cache_service.get(cache_key)
+        specs = parse_indicator_set(indicator_set)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        if cached_data:
-            return cached_data
+    try:
+        result = await nse_service.get_indicators(symbol, specs, start, end)
+        if nse_service.history.last_date(symbol) is None:
+            raise HTTPException(status_code=404, detail="No history for symbol")
+
+        return {
+            "symbol": symbol.upper(),
+            "interval": "1d",
+            "count": len(result["date"]),
+            "date": dates_to_list(result["date"]),
+            "indicators": {
+                label: {name: series_to_list(values) for name, values in outputs.items()}
+                for label, outputs in result["indicators"].items()
+            }
+        }
 
-        stock_data = await nse_service.get_stock_detail(symbol)
-        if not stock_data:
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Indicator calculation failed for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to calculate indicators")
+
+@app.get("/stocks/{symbol}", response_model=Dict[str, Any])
+@limiter.limit("60/minute")
+async def get_stock_detail(request: Request, symbol: str):
+    """Get detailed information for a specific stock"""
+    # One spelling for the cache key, the symbol tag and upstream
+    symbol = symbol.strip().upper()
+    if not nse_service.is_known_symbol(symbol):
+        raise HTTPException(status_code=404, detail="Stock not found")
+
+    try:
+        # Cached JSON bytes go straight into the response body
+        body = await cache_service.get_or_compute_encoded(
+            f"stock_detail:{symbol}",
+            lambda: nse_service.get_stock_detail(symbol),
+            ttl=market_ttl(30),
+            stale_ttl=settings.cache_stale_ttl,
+            tags=[f"symbol:{symbol}"]
+        )
+        if not body:
             raise HTTPException(status_code=404, detail="Stock not found")
 
-        await cache_service.set(cache_key, stock_data, ttl=180)  # 3 minutes
-        return stock_data
+        return Response(content=body, media_type="application/json")
 
     except HTTPException:
         raise
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Market data temporarily unavailable")
     except Exception as e:
         logger.error(f"Stock detail fetch failed for {symbol}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch stock details")
 
+@app.get("/indices", response_model=Dict[str, Any])
+@limiter.limit("60/minute")
+async def get_market_indices(request: Request):
+    """Get major NSE market indices"""
+    async def fetch_indices():
+        result = await nse_service.get_market_indices()
+        if result.get("error"):
+            # Raise so failures are not cached
+            raise HTTPException(status_code=502, detail="Market indices unavailable")
+        return result
+
+    return await cache_service.get_or_compute(
+        "market_indices", fetch_indices, ttl=market_ttl(15), stale_ttl=settings.cache_stale_ttl
+    )
+
 @app.post("/ai/chat", response_model=Dict[str, str])
 @limiter.limit("20/minute")
 async def ai_chat(
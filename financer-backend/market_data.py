@@ -0,0 +1,391 @@
+"""
+Market data providers: live yfinance/NSE access and a deterministic replay for offline load tests.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from upstream import CircuitBreaker, TokenBucketScheduler, UpstreamExecutor
+
+logger = logging.getLogger(__name__)
+
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+PERIOD_DAYS = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827}
+
+
+class ProviderError(Exception):
+    """Raised when a provider cannot serve a request"""
+    pass
+
+
+class NoDataError(ProviderError):
+    """Raised when upstream answered with nothing for the requested tickers"""
+    pass
+
+
+class MarketDataProvider(ABC):
+    """Source of quotes, details, daily history and index levels.
+
+    Frames use the yf.download(group_by='ticker') layout: (ticker, field) columns
+    with Open/High/Low/Close/Volume fields and a date index.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def get_quote_frame(self, tickers: List[str]) -> pd.DataFrame:
+        """Latest daily bar for each ticker"""
+
+    @abstractmethod
+    async def get_history_frame(
+        self,
+        tickers: List[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        period: Optional[str] = None,
+        adjusted: bool = False
+    ) -> pd.DataFrame:
+        """Daily bars in [start, end), or for the trailing period"""
+
+    @abstractmethod
+    async def get_detail(self, ticker: str) -> Dict[str, Any]:
+        """Company and quote details using yfinance `info` keys"""
+
+    @abstractmethod
+    async def get_indices(self) -> Dict[str, Any]:
+        """Raw NSE allIndices payload"""
+
+    async def close(self):
+        """Release provider resources"""
+        pass
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data: yfinance on the bounded upstream executor, indices from the NSE feed"""
+
+    name = "yfinance"
+
+    def __init__(self, executor: UpstreamExecutor, fetch_indices: Callable[[], Awaitable[Dict[str, Any]]]):
+        self.executor = executor
+        self.fetch_indices = fetch_indices
+
+    async def get_quote_frame(self, tickers: List[str]) -> pd.DataFrame:
+        tickers_str = " ".join(tickers)
+        data = await self.executor.run(lambda: yf.download(
+            tickers_str, period="1d", group_by="ticker", threads=True, progress=False
+        ))
+        if data is None or data.empty:
+            # yfinance logs and swallows request errors, so an empty batch is either an outage or
+            # tickers that don't exist; callers decide which by the breaker they use
+            raise NoDataError(f"No quotes returned for {len(tickers)} tickers")
+        return data
+
+    async def get_history_frame(
+        self,
+        tickers: List[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        period: Optional[str] = None,
+        adjusted: bool = False
+    ) -> pd.DataFrame:
+        window = {"period": period} if period else {"start": start.isoformat(), "end": end.isoformat()}
+        return await self.executor.run(lambda: yf.download(
+            " ".join(tickers),
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=adjusted,
+            threads=True,
+            progress=False,
+            **window
+        ))
+
+    async def get_detail(self, ticker: str) -> Dict[str, Any]:
+        return await self.executor.run(lambda: yf.Ticker(ticker).info)
+
+    async def get_indices(self) -> Dict[str, Any]:
+        return await self.fetch_indices()
+
+
+def _group_frame(bars: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Combine per-ticker OHLCV frames into the group_by='ticker' layout"""
+    if not bars:
+        return pd.DataFrame()
+    return pd.concat(bars, axis=1)
+
+
+class ReplayProvider(MarketDataProvider):
+    """Plays back recorded frames from disk, synthesising deterministic data for anything not recorded.
+
+    Layout of `root`:
+      quotes.jsonl       one {"quotes": {ticker: {Open, High, Low, Close, Volume}}} frame per line
+      allIndices.json    NSE allIndices payload
+      details.json       optional {ticker: info}
+      history/<T>.csv    optional Date,Open,High,Low,Close,Volume bars
+    """
+
+    name = "replay"
+
+    # Synthetic history starts here so overlapping requests see the same bars
+    EPOCH = date(2015, 1, 1)
+
+    def __init__(
+        self,
+        root: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 42
+    ):
+        self.root = root
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._quotes = self._load_quotes()
+        self._cursors: Dict[str, int] = {}
+        self._details = self._load_json("details.json") or {}
+        self._indices = self._load_json("allIndices.json")
+        self.calls = 0
+        self.injected_errors = 0
+
+    def _load_json(self, name: str) -> Optional[Any]:
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load_quotes(self) -> Dict[str, List[Dict[str, float]]]:
+        """Recorded bars per ticker, in recording order"""
+        quotes: Dict[str, List[Dict[str, float]]] = {}
+        path = os.path.join(self.root, "quotes.jsonl")
+        if not os.path.exists(path):
+            return quotes
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    for ticker, bar in json.loads(line)["quotes"].items():
+                        quotes.setdefault(ticker, []).append(bar)
+        logger.info(f"Loaded replay quotes for {len(quotes)} tickers from {path}")
+        return quotes
+
+    async def _simulate(self):
+        """Apply configured latency and error injection to one call"""
+        self.calls += 1
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.injected_errors += 1
+            raise ProviderError("Injected replay failure")
+
+    def _ticker_rng(self, ticker: str, *salt: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode()), *salt])
+
+    def _next_bar(self, ticker: str) -> Dict[str, float]:
+        """Next recorded bar for the ticker, looping, or a synthetic one"""
+        step = self._cursors.get(ticker, 0)
+        self._cursors[ticker] = step + 1
+        recorded = self._quotes.get(ticker)
+        if recorded:
+            return recorded[step % len(recorded)]
+
+        rng = self._ticker_rng(ticker)
+        base = rng.uniform(50, 5000)
+        rng = self._ticker_rng(ticker, step)
+        open_ = base * (1 + rng.normal(0, 0.01))
+        close = open_ * (1 + rng.normal(0, 0.02))
+        return {
+            "Open": open_,
+            "High": max(open_, close) * (1 + abs(rng.normal(0, 0.005))),
+            "Low": min(open_, close) * (1 - abs(rng.normal(0, 0.005))),
+            "Close": close,
+            "Volume": float(rng.integers(10_000, 5_000_000))
+        }
+
+    async def get_quote_frame(self, tickers: List[str]) -> pd.DataFrame:
+        await self._simulate()
+        index = pd.DatetimeIndex([pd.Timestamp(date.today())])
+        return _group_frame({
+            ticker: pd.DataFrame([self._next_bar(ticker)], index=index, columns=FIELDS)
+            for ticker in tickers
+        })
+
+    def _history(self, ticker: str, end: date) -> pd.DataFrame:
+        """Recorded or synthetic daily bars up to (not including) end"""
+        path = os.path.join(self.root, "history", f"{ticker}.csv")
+        if os.path.exists(path):
+            bars = pd.read_csv(path, index_col="Date", parse_dates=True)[FIELDS]
+            return bars[bars.index < pd.Timestamp(end)]
+
+        dates = pd.bdate_range(self.EPOCH, end - timedelta(days=1))
+        rng = self._ticker_rng(ticker)
+        close = rng.uniform(50, 5000) * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+        open_ = close * (1 + rng.normal(0, 0.005, len(dates)))
+        spread = np.abs(rng.normal(0, 0.01, len(dates)))
+        return pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close) * (1 + spread),
+            "Low": np.minimum(open_, close) * (1 - spread),
+            "Close": close,
+            "Volume": rng.integers(10_000, 5_000_000, len(dates)).astype(float)
+        }, index=dates)
+
+    async def get_history_frame(
+        self,
+        tickers: List[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        period: Optional[str] = None,
+        adjusted: bool = False
+    ) -> pd.DataFrame:
+        await self._simulate()
+        end = end or date.today()
+        if period:
+            start = end - timedelta(days=PERIOD_DAYS.get(period, 366))
+        frames = {}
+        for ticker in tickers:
+            bars = self._history(ticker, end)
+            frames[ticker] = bars[bars.index >= pd.Timestamp(start)] if start else bars
+        return _group_frame(frames)
+
+    async def get_detail(self, ticker: str) -> Dict[str, Any]:
+        await self._simulate()
+        if ticker in self._details:
+            return self._details[ticker]
+        bar = self._next_bar(ticker)
+        return {
+            "longName": ticker.replace(".NS", ""),
+            "currentPrice": bar["Close"],
+            "previousClose": bar["Open"],
+            "open": bar["Open"],
+            "dayHigh": bar["High"],
+            "dayLow": bar["Low"],
+            "volume": int(bar["Volume"])
+        }
+
+    async def get_indices(self) -> Dict[str, Any]:
+        await self._simulate()
+        if self._indices is None:
+            raise ProviderError("No recorded allIndices payload")
+        return self._indices
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Replay configuration and call counters"""
+        return {
+            "recorded_tickers": len(self._quotes),
+            "calls": self.calls,
+            "injected_errors": self.injected_errors,
+            "latency_ms": self.latency * 1000,
+            "error_rate": self.error_rate
+        }
+
+
+class RecordingProvider(MarketDataProvider):
+    """Wraps a live provider and appends what it returns in the replay layout"""
+
+    def __init__(self, inner: MarketDataProvider, root: str):
+        self.inner = inner
+        self.root = root
+        self.name = f"recording:{inner.name}"
+        os.makedirs(root, exist_ok=True)
+
+    async def get_quote_frame(self, tickers: List[str]) -> pd.DataFrame:
+        data = await self.inner.get_quote_frame(tickers)
+        if not data.empty and isinstance(data.columns, pd.MultiIndex):
+            quotes = {}
+            for ticker in tickers:
+                if ticker in data.columns.get_level_values(0):
+                    bar = data[ticker].iloc[-1]
+                    if not pd.isna(bar["Close"]):
+                        quotes[ticker] = {name: float(bar[name]) for name in FIELDS}
+            with open(os.path.join(self.root, "quotes.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps({"quotes": quotes}) + "\n")
+        return data
+
+    async def get_history_frame(self, tickers, start=None, end=None, period=None, adjusted=False) -> pd.DataFrame:
+        return await self.inner.get_history_frame(tickers, start, end, period, adjusted)
+
+    async def get_detail(self, ticker: str) -> Dict[str, Any]:
+        return await self.inner.get_detail(ticker)
+
+    async def get_indices(self) -> Dict[str, Any]:
+        payload = await self.inner.get_indices()
+        with open(os.path.join(self.root, "allIndices.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        return payload
+
+    async def close(self):
+        await self.inner.close()
+
+
+class ScheduledProvider(MarketDataProvider):
+    """Takes a permit from the token bucket, in the caller's lane, before each market data call"""
+
+    def __init__(self, inner: MarketDataProvider, scheduler: TokenBucketScheduler):
+        self.inner = inner
+        self.scheduler = scheduler
+        self.name = inner.name
+
+    async def get_quote_frame(self, tickers: List[str]) -> pd.DataFrame:
+        await self.scheduler.acquire()
+        return await self.inner.get_quote_frame(tickers)
+
+    async def get_history_frame(self, tickers, start=None, end=None, period=None, adjusted=False) -> pd.DataFrame:
+        await self.scheduler.acquire()
+        return await self.inner.get_history_frame(tickers, start, end, period, adjusted)
+
+    async def get_detail(self, ticker: str) -> Dict[str, Any]:
+        await self.scheduler.acquire()
+        return await self.inner.get_detail(ticker)
+
+    async def get_indices(self) -> Dict[str, Any]:
+        # The NSE feed is paced separately by nse_rate_limit_interval
+        return await self.inner.get_indices()
+
+    async def close(self):
+        await self.inner.close()
+
+
+class CircuitBreakerProvider(MarketDataProvider):
+    """Routes every call of another provider through a circuit breaker"""
+
+    def __init__(
+        self,
+        inner: MarketDataProvider,
+        breaker: CircuitBreaker,
+        index_breaker: Optional[CircuitBreaker] = None
+    ):
+        self.inner = inner
+        self.breaker = breaker
+        # Indices come from a different upstream, so they can trip independently
+        self.index_breaker = index_breaker or breaker
+        self.name = inner.name
+
+    async def get_quote_frame(self, tickers: List[str]) -> pd.DataFrame:
+        return await self.breaker.call(lambda: self.inner.get_quote_frame(tickers))
+
+    async def get_history_frame(self, tickers, start=None, end=None, period=None, adjusted=False) -> pd.DataFrame:
+        return await self.breaker.call(lambda: self.inner.get_history_frame(tickers, start, end, period, adjusted))
+
+    async def get_detail(self, ticker: str) -> Dict[str, Any]:
+        return await self.breaker.call(lambda: self.inner.get_detail(ticker))
+
+    async def get_indices(self) -> Dict[str, Any]:
+        return await self.index_breaker.call(self.inner.get_indices)
+
+    async def close(self):
+        await self.inner.close()
@@ -0,0 +1,107 @@
+"""
+Top gainers, losers and most-active rankings maintained per snapshot generation.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RANKINGS = ("gainers", "losers", "volume")
+
+
+def _quote_values(quote: Dict[str, Any]) -> Tuple[float, float]:
+    """(percent change, volume) of a quote, NaN when missing"""
+    change = quote.get("change_percent")
+    volume = (quote.get("otherDetails") or {}).get("volume")
+    return (
+        float(change) if change is not None else np.nan,
+        float(volume) if volume is not None else np.nan
+    )
+
+
+def _top(values: np.ndarray, ids: np.ndarray, depth: int) -> np.ndarray:
+    """Ids of the `depth` largest finite values, best first, without sorting everything"""
+    scores = values[ids]
+    finite = np.isfinite(scores)
+    ids, scores = ids[finite], scores[finite]
+    if len(ids) > depth:
+        keep = np.argpartition(-scores, depth - 1)[:depth]
+        ids, scores = ids[keep], scores[keep]
+    return ids[np.argsort(-scores, kind="stable")]
+
+
+class MoversIndex:
+    """Ranked quote lists, overall and per sector, rebuilt only when quotes change"""
+
+    def __init__(self, sectors: Dict[str, Optional[str]], depth: int = 50):
+        self.sectors = sectors
+        self.depth = depth
+        self.generation = 0
+        self._symbols: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._quotes: List[Dict[str, Any]] = []
+        self._change = np.empty(0)
+        self._volume = np.empty(0)
+        self._groups: Dict[Optional[str], np.ndarray] = {}
+        self._rankings: Dict[Tuple[str, Optional[str]], List[Dict[str, Any]]] = {}
+        self.rebuilds = 0
+        self.patches = 0
+
+    def _reset(self, quotes: List[Dict[str, Any]]):
+        """Lay out value columns for a new symbol universe"""
+        self._symbols = [quote["symbol"] for quote in quotes]
+        self._positions = {symbol: i for i, symbol in enumerate(self._symbols)}
+        values = np.array([_quote_values(quote) for quote in quotes], dtype=np.float64).reshape(-1, 2)
+        self._change, self._volume = values[:, 0].copy(), values[:, 1].copy()
+
+        by_sector: Dict[Optional[str], List[int]] = {}
+        for i, symbol in enumerate(self._symbols):
+            by_sector.setdefault(self.sectors.get(symbol), []).append(i)
+        self._groups = {None: np.arange(len(self._symbols))}
+        self._groups.update({
+            sector: np.array(ids) for sector, ids in by_sector.items() if sector is not None
+        })
+        self.rebuilds += 1
+
+    def update(self, quotes: List[Dict[str, Any]], changed: Set[str], generation: int):
+        """Apply a snapshot; only changed quotes are written into the value columns"""
+        self.generation = generation
+        self._quotes = quotes
+        if [quote["symbol"] for quote in quotes] != self._symbols:
+            self._reset(quotes)
+        elif changed:
+            for symbol in changed:
+                i = self._positions[symbol]
+                self._change[i], self._volume[i] = _quote_values(quotes[i])
+            self.patches += 1
+        elif self._rankings:
+            # Nothing moved; keep the ranked lists but point them at the new quote objects
+            self._rankings = {
+                key: [quotes[self._positions[q["symbol"]]] for q in ranked]
+                for key, ranked in self._rankings.items()
+            }
+            return
+
+        columns = {"gainers": self._change, "losers": -self._change, "volume": self._volume}
+        self._rankings = {
+            (by, sector): [quotes[i] for i in _top(columns[by], ids, self.depth)]
+            for by in RANKINGS
+            for sector, ids in self._groups.items()
+        }
+
+    def top(self, by: str, k: int, sector: Optional[str] = None) -> List[Dict[str, Any]]:
+        """First k quotes of a precomputed ranking"""
+        return self._rankings.get((by, sector), [])[:k]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Ranking coverage and update counters"""
+        return {
+            "generation": self.generation,
+            "sectors": len(self._groups) - 1 if self._groups else 0,
+            "depth": self.depth,
+            "rebuilds": self.rebuilds,
+            "patches": self.patches
+        }
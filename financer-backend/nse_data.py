@@ -3,54 +3,218 @@ Enhanced NSE Data Service with improved error handling, caching, and additional
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+import os
+from typing import Callable, Dict, Any, Optional, List
+from datetime import date, datetime, timedelta
 import math
+import time
+import uuid
+from dataclasses import dataclass, field
 
 import aiohttp
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from fake_useragent import UserAgent
+import numpy as np
 import pandas as pd
 
+from config import settings
+from upstream import CircuitBreaker, CircuitOpenError, TokenBucketScheduler, UpstreamExecutor, upstream_lane
+from ticker_search import TickerIndex, TickerRecord, load_ticker_master
+from history_store import HistoryStore
+from quote_stream import QuoteStream
+from indicators import IndicatorEngine, IndicatorSpec
+from movers import MoversIndex
+from cache import encode_json
+from trading_calendar import TradingCalendar, load_trading_calendar
+from snapshot_index import SnapshotIndex, project_fields
+from market_data import (
+    CircuitBreakerProvider,
+    MarketDataProvider,
+    NoDataError,
+    ProviderError,
+    RecordingProvider,
+    ReplayProvider,
+    ScheduledProvider,
+    YFinanceProvider
+)
+
 logger = logging.getLogger(__name__)
 
 
-import yfinance as yf
+@dataclass
+class MarketSnapshot:
+    """Quotes for the whole ticker universe at one point in time"""
+    generation: int = 0
+    timestamp: Optional[datetime] = None
+    data: List[Dict[str, Any]] = field(default_factory=list)
+    refresh_ms: float = 0.0
+    # Generation at which each symbol's price or volume last changed
+    changed_at: Dict[str, int] = field(default_factory=dict)
+    # Generation at which each symbol dropped out of the universe
+    removed_at: Dict[str, int] = field(default_factory=dict)
+    index: Optional[SnapshotIndex] = None
+    # Encoded response bodies for this generation, keyed by query
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+class UnknownSymbolError(ValueError):
+    """Raised for a symbol that is not in the ticker master"""
+    pass
+
 
 class NSEDataService:
     """Enhanced NSE data service using yfinance for reliability"""
 
+    ENCODED_RESPONSES_PER_GENERATION = 256
+
     def __init__(self):
         self.ua = UserAgent()
+        self.ticker_master = self._load_ticker_master()
         self.tickers, self.company_names = self._get_all_nse_tickers()
+        self.ticker_index = TickerIndex(self.ticker_master)
+        self.calendar: TradingCalendar = load_trading_calendar(self._resolve_path(settings.trading_holidays_path))
+        self.snapshot = MarketSnapshot()
+        # Generations continue from the boot time, so a cursor from before a restart is always older
+        # than this process's; the boot id keeps ETags from matching another process's snapshot
+        self.generation_base = int(time.time()) * 1000
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.snapshot_error: Optional[str] = None
+        self.sectors = {record.symbol: record.sector for record in self.ticker_master}
+        self.movers = MoversIndex(self.sectors)
+        self.executor = UpstreamExecutor(
+            "nse-upstream",
+            max_workers=settings.upstream_max_workers,
+            max_queue=settings.upstream_max_queue,
+            timeout=settings.upstream_timeout
+        )
+
+        # NSE index feed over a shared keep-alive session
+        self.base_url = settings.nse_base_url
+        self.api_base = settings.nse_api_base
+        self.request_timeout = settings.nse_request_timeout
+        self.rate_limit_interval = settings.nse_rate_limit_interval
+        self.tracked_indices = ["NIFTY 50", "NIFTY BANK", "NIFTY IT", "NIFTY TOTAL MARKET"]
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._session_primed = False
+        self._rate_lock = asyncio.Lock()
+        self._last_request_at = 0.0
+
+        # Where quotes, details, history and indices come from: breakers outside, so an open
+        # circuit fails fast without spending a token, then the rate scheduler
+        self.scheduler = TokenBucketScheduler(
+            "market-data", rate=settings.upstream_rate_limit, burst=settings.upstream_burst
+        )
+        scheduled = ScheduledProvider(self._create_provider(), self.scheduler)
+        # Client-chosen symbols (detail, history, compare, streams): an empty answer means the
+        # symbols don't exist, not that upstream is down
+        self.breaker = self._create_breaker("market-data", excluded=(NoDataError,))
+        self.index_breaker = self._create_breaker("nse-indices")
+        self.provider = CircuitBreakerProvider(scheduled, self.breaker, self.index_breaker)
+        # The universe refresh trips on its own, so per-user calls can't take the snapshot down
+        self.universe_breaker = self._create_breaker("market-universe")
+        self.universe_provider = CircuitBreakerProvider(scheduled, self.universe_breaker)
+
+        # Local OHLCV history, filled incrementally from yfinance
+        self.history = HistoryStore(self._resolve_path(settings.history_dir))
+        self._history_checked: Dict[str, date] = {}
+        self._history_locks: Dict[str, asyncio.Lock] = {}
+        self.indicators = IndicatorEngine()
+
+        # One upstream poll fanned out to every live quote subscriber
+        self.quote_stream = QuoteStream(
+            self._poll_stream_quotes,
+            interval=settings.quote_stream_interval,
+            queue_size=settings.quote_stream_queue_size,
+            is_active=self.calendar.is_active
+        )
+
+    @staticmethod
+    def _create_breaker(name: str, excluded: tuple = ()) -> CircuitBreaker:
+        return CircuitBreaker(
+            name,
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_timeout=settings.circuit_reset_timeout,
+            half_open_max_calls=settings.circuit_half_open_calls,
+            excluded=excluded
+        )
+
+    def _create_provider(self) -> MarketDataProvider:
+        """Build the configured market data provider"""
+        name = settings.market_data_provider
+        if name == "replay":
+            logger.info(f"Replaying market data from {settings.replay_dir}")
+            return ReplayProvider(
+                self._resolve_path(settings.replay_dir),
+                latency=settings.replay_latency_ms / 1000,
+                jitter=settings.replay_jitter_ms / 1000,
+                error_rate=settings.replay_error_rate,
+                seed=settings.replay_seed
+            )
+
+        live = YFinanceProvider(self.executor, self._fetch_all_indices)
+        if name == "record":
+            logger.info(f"Recording market data to {settings.replay_dir}")
+            return RecordingProvider(live, self._resolve_path(settings.replay_dir))
+        return live
+
+    @staticmethod
+    def _resolve_path(path: str) -> str:
+        """Resolve paths in settings relative to the backend directory"""
+        if os.path.isabs(path):
+            return path
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+    def _load_ticker_master(self) -> List[TickerRecord]:
+        """Load the bundled NSE equity master, falling back to the NIFTY 50 list"""
+        path = self._resolve_path(settings.ticker_master_path)
+        try:
+            start = time.perf_counter()
+            records = load_ticker_master(path)
+            if records:
+                logger.info(
+                    f"Loaded {len(records)} NSE equities from {path} "
+                    f"in {(time.perf_counter() - start) * 1000:.1f}ms"
+                )
+                return records
+        except Exception as e:
+            logger.warning(f"Failed to load ticker master {path}: {e}")
 
-    def _get_all_nse_tickers(self) -> tuple[List[str], Dict[str, str]]:
-        """Return default NSE equity tickers"""
         default_tickers = [
-            "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "ICICIBANK.NS", "INFY.NS",
-            "HINDUNILVR.NS", "ITC.NS", "SBIN.NS", "BHARTIARTL.NS", "KOTAKBANK.NS",
-            "LT.NS", "AXISBANK.NS", "ASIANPAINT.NS", "MARUTI.NS", "TITAN.NS",
-            "BAJFINANCE.NS", "HCLTECH.NS", "SUNPHARMA.NS", "TATAMOTORS.NS", "ULTRACEMCO.NS",
-            "POWERGRID.NS", "NTPC.NS", "M&M.NS", "ONGC.NS", "ADANIENT.NS",
-            "ADANIPORTS.NS", "BAJAJFINSV.NS", "BPCL.NS", "BRITANNIA.NS", "CIPLA.NS",
-            "COALINDIA.NS", "DIVISLAB.NS", "DRREDDY.NS", "EICHERMOT.NS", "GRASIM.NS",
-            "HEROMOTOCO.NS", "HINDALCO.NS", "INDUSINDBK.NS", "JSWSTEEL.NS", "LTIM.NS",
-            "NESTLEIND.NS", "SBILIFE.NS", "TATACONSUM.NS", "TATASTEEL.NS", "TECHM.NS",
-            "UPL.NS", "WIPRO.NS", "APOLLOHOSP.NS", "BAJAJ-AUTO.NS"
+            "RELIANCE", "TCS", "HDFCBANK", "ICICIBANK", "INFY",
+            "HINDUNILVR", "ITC", "SBIN", "BHARTIARTL", "KOTAKBANK",
+            "LT", "AXISBANK", "ASIANPAINT", "MARUTI", "TITAN",
+            "BAJFINANCE", "HCLTECH", "SUNPHARMA", "TATAMOTORS", "ULTRACEMCO",
+            "POWERGRID", "NTPC", "M&M", "ONGC", "ADANIENT",
+            "ADANIPORTS", "BAJAJFINSV", "BPCL", "BRITANNIA", "CIPLA",
+            "COALINDIA", "DIVISLAB", "DRREDDY", "EICHERMOT", "GRASIM",
+            "HEROMOTOCO", "HINDALCO", "INDUSINDBK", "JSWSTEEL", "LTIM",
+            "NESTLEIND", "SBILIFE", "TATACONSUM", "TATASTEEL", "TECHM",
+            "UPL", "WIPRO", "APOLLOHOSP", "BAJAJ-AUTO"
         ]
-        default_mapping = {t.replace(".NS", ""): t.replace(".NS", "") for t in default_tickers}
-        
         logger.info(f"Using default NSE ticker list with {len(default_tickers)} tickers.")
-        return default_tickers, default_mapping
+        return [TickerRecord(symbol=symbol, name=symbol) for symbol in default_tickers]
+
+    def _get_all_nse_tickers(self) -> tuple[List[str], Dict[str, str]]:
+        """Return yfinance tickers and company names from the ticker master"""
+        tickers = [f"{record.symbol}.NS" for record in self.ticker_master]
+        company_names = {record.symbol: record.name for record in self.ticker_master}
+        return tickers, company_names
+
+    def is_known_symbol(self, symbol: str) -> bool:
+        """Whether a symbol is in the ticker master"""
+        return symbol.strip().upper() in self.company_names
+
+    def search_tickers(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Fuzzy search over symbols and company names"""
+        return self.ticker_index.search(query, limit=limit)
 
     async def get_stock_data(self, skip: int = 0, limit: int = 20) -> Dict[str, Any]:
         """Get NSE stock market data using yfinance with batching and pagination"""
         try:
-            processed_data = []
-            
             # Calculate target tickers based on pagination
             total_tickers = len(self.tickers)
             end_index = min(skip + limit, total_tickers)
@@ -65,76 +229,7 @@ class NSEDataService:
                     "has_more": False
                 }
 
-            chunk_size = 100 # Fetch 100 at a time to be safe (though limit might be smaller)
-            
-            loop = asyncio.get_event_loop()
-            
-            # Process target tickers in chunks
-            for i in range(0, len(target_tickers), chunk_size):
-                chunk = target_tickers[i:i + chunk_size]
-                tickers_str = " ".join(chunk)
-                
-                try:
-                    # Run yfinance download in a separate thread
-                    data = await loop.run_in_executor(None, lambda: yf.download(tickers_str, period="1d", group_by='ticker', threads=True, progress=False))
-                    
-                    if data.empty:
-                        continue
-                        
-                    for ticker in chunk:
-                        try:
-                            # Handle single ticker vs multiple ticker response structure
-                            if len(chunk) == 1:
-                                stock_data = data
-                            else:
-                                try:
-                                    stock_data = data[ticker]
-                                except KeyError:
-                                    continue
-                            
-                            if stock_data.empty:
-                                continue
-
-                            # Get latest row
-                            latest = stock_data.iloc[-1]
-                            
-                            # Check for NaN values which indicate missing data
-                            if pd.isna(latest['Close']):
-                                continue
-
-                            # Calculate change
-                            current_price = float(latest['Close'])
-                            open_price = float(latest['Open'])
-                            change = current_price - open_price
-                            p_change = (change / open_price) * 100 if open_price else 0
-                            
-                            symbol = ticker.replace(".NS", "")
-                            name = self.company_names.get(symbol, symbol)
-                            
-                            processed_stock = {
-                                "symbol": symbol,
-                                "name": name,
-                                "lastPrice": f"{current_price:,.2f}",
-                                "pChange": f"{p_change:+.2f}",
-                                "change": change,
-                                "change_percent": p_change,
-                                "otherDetails": {
-                                    "open": float(latest['Open']),
-                                    "high": float(latest['High']),
-                                    "low": float(latest['Low']),
-                                    "volume": int(latest['Volume']) if not pd.isna(latest['Volume']) else 0,
-                                    "chartToday": None
-                                }
-                            }
-                            processed_data.append(processed_stock)
-                            
-                        except Exception as e:
-                            # logger.warning(f"Error processing {ticker}: {e}")
-                            continue
-                            
-                except Exception as e:
-                    logger.error(f"Error fetching chunk {i}: {e}")
-                    continue
+            processed_data = await self._download_quotes(target_tickers, self.universe_provider)
 
             return {
                 "data": processed_data,
@@ -152,11 +247,375 @@ class NSEDataService:
                 "timestamp": datetime.utcnow().isoformat()
             }
 
+    async def _download_quotes(
+        self,
+        tickers: List[str],
+        provider: Optional[MarketDataProvider] = None
+    ) -> List[Dict[str, Any]]:
+        """Download latest quotes for yfinance tickers in chunks"""
+        provider = provider or self.provider
+        processed_data = []
+        chunk_size = 100 # Fetch 100 at a time to be safe (though limit might be smaller)
+
+        # Process target tickers in chunks
+        for i in range(0, len(tickers), chunk_size):
+            chunk = tickers[i:i + chunk_size]
+
+            try:
+                data = await provider.get_quote_frame(chunk)
+
+                if data.empty:
+                    continue
+
+                processed_data.extend(self._frame_to_quotes(data, chunk))
+
+            except CircuitOpenError as e:
+                # Remaining chunks would be rejected too
+                logger.warning(f"Skipping quote download: {e}")
+                break
+            except Exception as e:
+                logger.error(f"Error fetching chunk {i}: {e}")
+                continue
+
+        return processed_data
+
+    async def _poll_stream_quotes(self, symbols: List[str]) -> List[Dict[str, Any]]:
+        """Fetch quotes for live stream subscribers"""
+        with upstream_lane("refresh"):
+            return await self._download_quotes([f"{symbol}.NS" for symbol in symbols])
+
+    async def refresh_snapshot(self) -> MarketSnapshot:
+        """Fetch the whole ticker universe and publish it as a new snapshot generation"""
+        start = time.perf_counter()
+        with upstream_lane("refresh"):
+            result = await self.get_stock_data(skip=0, limit=len(self.tickers))
+
+        if result["error"] or not result["data"]:
+            # Keep serving the previous generation rather than an empty universe
+            self.snapshot_error = result["error"] or "No quotes returned"
+            logger.warning(f"Snapshot refresh failed: {self.snapshot_error}")
+            return self.snapshot
+
+        self._publish_snapshot(result["data"], (time.perf_counter() - start) * 1000)
+        self.snapshot_error = None
+        logger.info(
+            f"Market snapshot generation {self.snapshot.generation} loaded "
+            f"with {len(self.snapshot.data)} quotes in {self.snapshot.refresh_ms:.0f}ms"
+        )
+        return self.snapshot
+
+    @staticmethod
+    def _quote_fingerprint(quote: Dict[str, Any]) -> tuple:
+        """Fields whose change makes a quote part of a delta"""
+        return quote.get("lastPrice"), (quote.get("otherDetails") or {}).get("volume")
+
+    def _publish_snapshot(self, data: List[Dict[str, Any]], refresh_ms: float):
+        """Swap in a new snapshot generation and record which symbols changed"""
+        previous = self.snapshot
+        generation = max(previous.generation, self.generation_base) + 1
+        previous_quotes = {quote["symbol"]: quote for quote in previous.data}
+
+        changed_at = dict(previous.changed_at)
+        removed_at = dict(previous.removed_at)
+        changed = set()
+        for quote in data:
+            old = previous_quotes.pop(quote["symbol"], None)
+            if old is None or self._quote_fingerprint(old) != self._quote_fingerprint(quote):
+                changed_at[quote["symbol"]] = generation
+                changed.add(quote["symbol"])
+            removed_at.pop(quote["symbol"], None)
+        # Whatever is left was in the previous generation but not this one
+        for symbol in previous_quotes:
+            changed_at.pop(symbol, None)
+            removed_at[symbol] = generation
+
+        self.snapshot = MarketSnapshot(
+            generation=generation,
+            timestamp=datetime.utcnow(),
+            data=data,
+            refresh_ms=refresh_ms,
+            changed_at=changed_at,
+            removed_at=removed_at,
+            index=SnapshotIndex(data, self.sectors)
+        )
+        self.movers.update(data, changed, generation)
+        # Universe refreshes double as a stream poll for any subscribed symbols
+        if self.quote_stream.subscribers:
+            self.quote_stream.publish(data)
+
+    async def run_snapshot_refresher(self, interval: float):
+        """Refresh the market snapshot every `interval` seconds while the market is active"""
+        while True:
+            try:
+                await self.refresh_snapshot()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.snapshot_error = str(e)
+                logger.error(f"Snapshot refresher error: {e}")
+
+            delay = interval
+            if self.snapshot_error is None:
+                # Closed market: the snapshot holds final prices until the next pre-open
+                delay = self.calendar.refresh_delay(interval, max_delay=settings.market_closed_max_ttl)
+                if delay > interval:
+                    logger.info(f"Market closed, next snapshot refresh in {delay / 3600:.1f}h")
+            await asyncio.sleep(delay)
+
+    def get_snapshot_page(
+        self,
+        skip: int = 0,
+        limit: int = 20,
+        sort: Optional[str] = None,
+        order: str = "desc",
+        sector: Optional[str] = None,
+        min_price: Optional[float] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Serve one sorted, filtered page of the current snapshot without touching upstream"""
+        snapshot = self.snapshot
+        index = snapshot.index or SnapshotIndex(snapshot.data, self.sectors)
+        page, total = index.query(sort, order, sector, min_price, skip, limit)
+        end_index = max(skip, 0) + len(page)
+
+        return {
+            "data": project_fields(page, fields),
+            "error": None,
+            "timestamp": snapshot.timestamp.isoformat() if snapshot.timestamp else None,
+            "generation": snapshot.generation,
+            # Last refresh failed, so these quotes are from an older successful one
+            "stale": self.snapshot_error is not None,
+            "total_count": total,
+            "has_more": end_index < total
+        }
+
+    def get_snapshot_changes(self, since: int, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Quotes whose price or volume changed after generation `since`, and symbols removed since.
+
+        A `since` from before this process started, or ahead of it, can't be diffed against, so
+        every quote is returned with `reset: true`.
+        """
+        snapshot = self.snapshot
+        reset = since < self.generation_base or since > snapshot.generation
+        if reset:
+            changed = snapshot.data
+            removed = []
+        else:
+            changed = [
+                quote for quote in snapshot.data
+                if snapshot.changed_at.get(quote["symbol"], 0) > since
+            ]
+            removed = sorted(symbol for symbol, generation in snapshot.removed_at.items() if generation > since)
+        return {
+            "data": project_fields(changed, fields),
+            "error": None,
+            "timestamp": snapshot.timestamp.isoformat() if snapshot.timestamp else None,
+            "generation": snapshot.generation,
+            "stale": self.snapshot_error is not None,
+            "since": since,
+            "reset": reset,
+            "removed": removed,
+            "total_count": len(snapshot.data),
+            "changed_count": len(changed)
+        }
+
+    def get_movers(self, by: str = "gainers", k: int = 10, sector: Optional[str] = None) -> Dict[str, Any]:
+        """Top-k quotes from the rankings kept for the current snapshot"""
+        snapshot = self.snapshot
+        return {
+            "by": by,
+            "sector": sector,
+            "data": self.movers.top(by, k, sector),
+            "generation": snapshot.generation,
+            "timestamp": snapshot.timestamp.isoformat() if snapshot.timestamp else None
+        }
+
+    def export_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Current snapshot quotes and time, for a warm restart"""
+        if not self.snapshot.generation:
+            return None
+        return {"timestamp": self.snapshot.timestamp.isoformat(), "data": self.snapshot.data}
+
+    def restore_snapshot(self, saved: Dict[str, Any]):
+        """Publish quotes saved by export_snapshot as a generation, keeping their original time"""
+        self._publish_snapshot(saved["data"], 0.0)
+        self.snapshot.timestamp = datetime.fromisoformat(saved["timestamp"])
+        logger.info(f"Restored market snapshot of {len(saved['data'])} quotes from {saved['timestamp']}")
+
+    def get_encoded_snapshot_response(self, variant: str, build: Callable[[], Dict[str, Any]]) -> bytes:
+        """JSON body for a snapshot response, encoded once per generation and query"""
+        snapshot = self.snapshot
+        key = f"{variant}|{self.snapshot_error is not None}"
+        body = snapshot.encoded.get(key)
+        if body is None:
+            body = encode_json(build())
+            if len(snapshot.encoded) < self.ENCODED_RESPONSES_PER_GENERATION:
+                snapshot.encoded[key] = body
+        return body
+
+    def snapshot_etag(self, variant: str = "") -> str:
+        """Strong ETag for a response derived from the current generation of this process"""
+        digest = hashlib.blake2b(variant.encode(), digest_size=8).hexdigest()
+        return f'"{self.boot_id}.{self.snapshot.generation}-{digest}"'
+
+    def get_snapshot_stats(self) -> Dict[str, Any]:
+        """Freshness information for the current snapshot"""
+        snapshot = self.snapshot
+        age = (datetime.utcnow() - snapshot.timestamp).total_seconds() if snapshot.timestamp else None
+        return {
+            "generation": snapshot.generation,
+            "timestamp": snapshot.timestamp.isoformat() if snapshot.timestamp else None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "quotes": len(snapshot.data),
+            "refresh_ms": round(snapshot.refresh_ms, 1),
+            "last_error": self.snapshot_error
+        }
+
+    def _frame_to_quotes(self, data: pd.DataFrame, tickers: List[str]) -> List[Dict[str, Any]]:
+        """Convert the last row of a yf.download frame into quote records in one columnar pass"""
+        columns = data.columns
+        if not isinstance(columns, pd.MultiIndex):
+            # Single ticker downloads come back with flat OHLCV columns
+            columns = pd.MultiIndex.from_product([tickers[:1], columns])
+
+        last_row = data.iloc[-1:].to_numpy(dtype=np.float64, na_value=np.nan)[0]
+
+        def field(name: str) -> np.ndarray:
+            positions = columns.get_indexer(pd.MultiIndex.from_product([tickers, [name]]))
+            values = np.full(len(tickers), np.nan)
+            found = positions >= 0
+            values[found] = last_row[positions[found]]
+            return values
+
+        close = field("Close")
+        open_ = field("Open")
+        high = field("High")
+        low = field("Low")
+        volume = field("Volume")
+
+        # Missing tickers and rows without a close are dropped together
+        mask = ~np.isnan(close)
+        if not mask.any():
+            return []
+
+        close, open_, high, low, volume = close[mask], open_[mask], high[mask], low[mask], volume[mask]
+        change = close - open_
+        p_change = np.divide(change, open_, out=np.zeros_like(change), where=open_ != 0) * 100
+        volume = np.nan_to_num(volume, nan=0.0).astype(np.int64)
+
+        quotes = []
+        kept = [ticker for ticker, keep in zip(tickers, mask) if keep]
+        for ticker, c, o, h, l, v, ch, pc in zip(
+            kept, close.tolist(), open_.tolist(), high.tolist(), low.tolist(),
+            volume.tolist(), change.tolist(), p_change.tolist()
+        ):
+            symbol = ticker.replace(".NS", "")
+            quotes.append({
+                "symbol": symbol,
+                "name": self.company_names.get(symbol, symbol),
+                "lastPrice": f"{c:,.2f}",
+                "pChange": f"{pc:+.2f}",
+                "change": ch,
+                "change_percent": pc,
+                "otherDetails": {
+                    "open": o,
+                    "high": h,
+                    "low": l,
+                    "volume": v,
+                    "chartToday": None
+                }
+            })
+        return quotes
+
+    async def get_history(
+        self,
+        symbol: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        interval: str = "1d"
+    ) -> Dict[str, np.ndarray]:
+        """Read OHLCV history from the local store, fetching only missing days first"""
+        symbol = symbol.strip().upper()
+        if not self.is_known_symbol(symbol):
+            # Each unknown symbol would cost a multi-year backfill and a lock that is never pruned
+            raise UnknownSymbolError(f"Unknown symbol {symbol}")
+        await self._fill_history(symbol)
+        return self.history.read(symbol, start, end, interval)
+
+    async def get_indicators(
+        self,
+        symbol: str,
+        specs: List[IndicatorSpec],
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """Compute indicators over the full daily history, then slice to [start, end]"""
+        symbol = symbol.upper()
+        # Warm-up rows come from the whole history so values don't depend on the range asked for
+        bars = await self.get_history(symbol)
+        dates = bars["date"]
+        lo = int(np.searchsorted(dates, np.datetime64(start, "D"), side="left")) if start else 0
+        hi = int(np.searchsorted(dates, np.datetime64(end, "D"), side="right")) if end else len(dates)
+
+        results = {}
+        for spec in specs:
+            outputs = self.indicators.compute(symbol, spec, bars)
+            results[spec.label] = {name: values[lo:hi] for name, values in outputs.items()}
+        return {"date": dates[lo:hi], "indicators": results}
+
+    async def _fill_history(self, symbol: str):
+        """Append completed daily bars newer than the last stored one, at most once a day"""
+        today = date.today()
+        if self._history_checked.get(symbol) == today:
+            return
+
+        lock = self._history_locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            if self._history_checked.get(symbol) == today:
+                return
+
+            last = self.history.last_date(symbol)
+            fetch_from = last + timedelta(days=1) if last else today - timedelta(days=365 * settings.history_backfill_years)
+            if fetch_from < today:
+                try:
+                    columns = await self._download_history(symbol, fetch_from, today)
+                    if columns:
+                        written = self.history.append(symbol, columns)
+                        logger.info(f"Stored {written} new daily bars for {symbol}")
+                except Exception as e:
+                    # Leave unchecked so the next request retries
+                    logger.error(f"History fetch failed for {symbol}: {e}")
+                    return
+
+            self._history_checked[symbol] = today
+
+    async def _download_history(self, symbol: str, start: date, end: date) -> Optional[Dict[str, np.ndarray]]:
+        """Download daily bars in [start, end) as NumPy columns"""
+        with upstream_lane("backfill"):
+            data = await self.provider.get_history_frame([f"{symbol}.NS"], start=start, end=end)
+        if data is None or data.empty:
+            return None
+
+        if isinstance(data.columns, pd.MultiIndex):
+            # Newer yfinance releases add a ticker level even for one symbol
+            level = 0 if "Close" in data.columns.get_level_values(0) else 1
+            data = data.droplevel(1 - level, axis=1)
+
+        close = data["Close"].to_numpy(dtype=np.float64)
+        mask = ~np.isnan(close)
+        return {
+            "date": data.index.to_numpy().astype("datetime64[D]")[mask],
+            "open": data["Open"].to_numpy(dtype=np.float64)[mask],
+            "high": data["High"].to_numpy(dtype=np.float64)[mask],
+            "low": data["Low"].to_numpy(dtype=np.float64)[mask],
+            "close": close[mask],
+            "volume": data["Volume"].to_numpy(dtype=np.float64)[mask],
+        }
+
     async def get_stock_detail(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Get detailed information for a specific stock"""
         try:
-            ticker = yf.Ticker(f"{symbol}.NS")
-            info = ticker.info
+            info = await self.provider.get_detail(f"{symbol}.NS")
             
             return {
                 "symbol": symbol,
@@ -174,10 +633,70 @@ class NSEDataService:
                     "chartToday": None
                 }
             }
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching detail for {symbol}: {e}")
             return None
 
+    async def compare_stocks(self, symbols: List[str], period: str = "1y") -> Optional[Dict[str, Any]]:
+        """Compare symbols over a period from one batched daily download"""
+        tickers = [f"{symbol}.NS" for symbol in symbols]
+        data = await self.provider.get_history_frame(tickers, period=period, adjusted=True)
+        if data is None or data.empty:
+            return None
+
+        result = self._comparison_stats(self._close_matrix(data, tickers))
+        if result:
+            result["period"] = period
+        return result
+
+    @staticmethod
+    def _close_matrix(data: pd.DataFrame, tickers: List[str]) -> pd.DataFrame:
+        """Date x symbol close prices from a group_by='ticker' download; absent tickers are all NaN"""
+        closes = {}
+        per_ticker = isinstance(data.columns, pd.MultiIndex)
+        downloaded = set(data.columns.get_level_values(0)) if per_ticker else set()
+        for ticker in tickers:
+            symbol = ticker.replace(".NS", "")
+            if ticker in downloaded:
+                closes[symbol] = data[ticker]["Close"]
+            elif not per_ticker and len(tickers) == 1:
+                # Without a ticker level the frame holds one symbol's bars, so only a lone ticker can own them
+                closes[symbol] = data["Close"]
+            else:
+                # Reported under `missing` rather than silently dropped
+                closes[symbol] = pd.Series(np.nan, index=data.index)
+        return pd.DataFrame(closes)
+
+    @staticmethod
+    def _comparison_stats(closes: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """Aligned cumulative returns, correlation, volatility and drawdown in one pass"""
+        missing = [symbol for symbol in closes.columns if closes[symbol].isna().all()]
+        # Keep only days on which every remaining symbol traded
+        aligned = closes.drop(columns=missing).dropna()
+        if aligned.shape[1] < 2 or len(aligned) < 3:
+            return None
+
+        symbols = list(aligned.columns)
+        prices = aligned.to_numpy(dtype=np.float64)
+        daily = prices[1:] / prices[:-1] - 1
+        cumulative = prices / prices[0] - 1
+        correlation = np.corrcoef(daily, rowvar=False)
+        volatility = daily.std(axis=0, ddof=1) * math.sqrt(252)
+        drawdown = (prices / np.maximum.accumulate(prices, axis=0) - 1).min(axis=0)
+
+        return {
+            "symbols": symbols,
+            "missing": missing,
+            "dates": np.datetime_as_string(aligned.index.to_numpy().astype("datetime64[D]"), unit="D").tolist(),
+            "returns": {symbol: np.round(cumulative[:, i], 6).tolist() for i, symbol in enumerate(symbols)},
+            "correlation": np.round(correlation, 4).tolist(),
+            "volatility": dict(zip(symbols, np.round(volatility, 6).tolist())),
+            "max_drawdown": dict(zip(symbols, np.round(drawdown, 6).tolist())),
+            "total_return": dict(zip(symbols, np.round(cumulative[-1], 6).tolist()))
+        }
+
     async def calculate_fd_returns(
         self,
         principal: float,
@@ -259,45 +778,92 @@ class NSEDataService:
         except (ValueError, TypeError):
             return None
 
-    async def get_market_indices(self) -> Dict[str, Any]:
-        """Get major market indices"""
-        try:
-            await self._rate_limit_wait()
-
-            if not self._establish_session():
-                return {"error": "Failed to establish session"}
-
-            url = f"{self.api_base}/allIndices"
-            response = self.session.get(
-                url,
+    def _get_headers(self) -> Dict[str, str]:
+        """Browser-like headers expected by the NSE API"""
+        return {
+            "User-Agent": self.ua.random,
+            "Accept": "application/json, text/plain, */*",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Referer": f"{self.base_url}/"
+        }
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared keep-alive session, creating it on first use"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=10, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
                 headers=self._get_headers(),
-                timeout=10
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
             )
+            self._session_primed = False
+        return self.session
+
+    async def _establish_session(self) -> bool:
+        """Visit the NSE home page once so the session carries its cookies"""
+        session = await self._get_session()
+        if self._session_primed:
+            return True
+        try:
+            await self._rate_limit_wait()
+            async with session.get(self.base_url) as response:
+                await response.read()
+                response.raise_for_status()
+            self._session_primed = True
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to establish NSE session: {e}")
+            return False
+
+    async def _rate_limit_wait(self):
+        """Space NSE requests at least nse_rate_limit_interval apart"""
+        async with self._rate_lock:
+            elapsed = time.monotonic() - self._last_request_at
+            if elapsed < self.rate_limit_interval:
+                await asyncio.sleep(self.rate_limit_interval - elapsed)
+            self._last_request_at = time.monotonic()
+
+    async def _fetch_all_indices(self) -> Dict[str, Any]:
+        """Raw allIndices payload from the NSE API"""
+        if not await self._establish_session():
+            raise ProviderError("Failed to establish session")
+
+        await self._rate_limit_wait()
+        session = await self._get_session()
+        async with session.get(f"{self.api_base}/allIndices") as response:
             response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def get_market_indices(self) -> Dict[str, Any]:
+        """Get major market indices"""
+        try:
+            data = await self.provider.get_indices()
 
-            data = response.json()
             indices = []
+            last_updated = datetime.utcnow().isoformat()
 
             for index in data.get("data", []):
-                if index.get("key") in ["NIFTY 50", "NIFTY BANK", "NIFTY IT", "NIFTY TOTAL MARKET"]:
+                if index.get("index") in self.tracked_indices:
                     indices.append({
-                        "name": index.get("name"),
+                        "name": index.get("index"),
                         "value": self._safe_float_parse(index.get("last")),
-                        "change": self._safe_float_parse(index.get("change")),
-                        "change_percent": self._safe_float_parse(index.get("pChange")),
-                        "last_updated": datetime.utcnow().isoformat()
+                        "change": self._safe_float_parse(index.get("variation")),
+                        "change_percent": self._safe_float_parse(index.get("percentChange")),
+                        "last_updated": last_updated
                     })
 
             return {
                 "indices": indices,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": last_updated
             }
 
         except Exception as e:
             logger.error(f"Error fetching market indices: {e}")
             return {"error": str(e)}
 
-    def __del__(self):
-        """Cleanup session on destruction"""
-        # No session to close with yfinance
-        pass
+    async def close(self):
+        """Close the provider and the shared NSE HTTP session"""
+        await self.provider.close()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
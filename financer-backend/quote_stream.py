@@ -0,0 +1,149 @@
+"""
+Live quote fan-out: one upstream poller shared by every streaming client.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One streaming client with a bounded queue of pending frames"""
+
+    def __init__(self, symbols: Iterable[str], queue_size: int):
+        self.symbols: Set[str] = set(symbols)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class QuoteStream:
+    """Poll the union of subscribed symbols once per interval and fan out changed quotes"""
+
+    def __init__(
+        self,
+        fetch_quotes: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+        interval: float = 5.0,
+        queue_size: int = 32,
+        is_active: Optional[Callable[[], bool]] = None
+    ):
+        self.fetch_quotes = fetch_quotes
+        self.interval = interval
+        self.queue_size = queue_size
+        # While this returns False, quotes cannot move; only symbols never seen are polled
+        self.is_active = is_active
+        self.subscribers: Set[Subscriber] = set()
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        self._symbol_counts: Dict[str, int] = {}
+        self._has_subscribers = asyncio.Event()
+        self.sequence = 0
+        self.polls = 0
+        self.frames_sent = 0
+        self.dropped = 0
+
+    @property
+    def symbols(self) -> List[str]:
+        """Union of all subscribed symbols"""
+        return sorted(self._symbol_counts)
+
+    def subscribe(self, symbols: Iterable[str]) -> Subscriber:
+        """Register a client and queue the last known quotes for its symbols"""
+        subscriber = Subscriber(symbols, self.queue_size)
+        self.subscribers.add(subscriber)
+        for symbol in subscriber.symbols:
+            self._symbol_counts[symbol] = self._symbol_counts.get(symbol, 0) + 1
+        self._has_subscribers.set()
+
+        initial = [self.latest[symbol] for symbol in sorted(subscriber.symbols) if symbol in self.latest]
+        if initial:
+            subscriber.queue.put_nowait(self._frame(initial))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a client; safe to call more than once"""
+        if subscriber not in self.subscribers:
+            return
+        self.subscribers.discard(subscriber)
+        for symbol in subscriber.symbols:
+            remaining = self._symbol_counts.get(symbol, 0) - 1
+            if remaining > 0:
+                self._symbol_counts[symbol] = remaining
+            else:
+                self._symbol_counts.pop(symbol, None)
+        if not self.subscribers:
+            self._has_subscribers.clear()
+
+    def _frame(self, quotes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "sequence": self.sequence,
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": quotes
+        }
+
+    def publish(self, quotes: List[Dict[str, Any]]) -> int:
+        """Diff quotes against the last known values and push changes to subscribers"""
+        changed: Dict[str, Dict[str, Any]] = {}
+        for quote in quotes:
+            symbol = quote["symbol"]
+            if self.latest.get(symbol) != quote:
+                self.latest[symbol] = quote
+                changed[symbol] = quote
+        if not changed:
+            return 0
+
+        self.sequence += 1
+        for subscriber in list(self.subscribers):
+            # Walk whichever side is smaller
+            if len(subscriber.symbols) < len(changed):
+                payload = [changed[s] for s in sorted(subscriber.symbols) if s in changed]
+            else:
+                payload = [q for s, q in changed.items() if s in subscriber.symbols]
+            if not payload:
+                continue
+            try:
+                subscriber.queue.put_nowait(self._frame(payload))
+                self.frames_sent += 1
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+        return len(changed)
+
+    def _drop(self, subscriber: Subscriber):
+        """Disconnect a consumer that cannot keep up"""
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        self.dropped += 1
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        # None tells the consumer to close its stream
+        subscriber.queue.put_nowait(None)
+        logger.info("Dropped slow quote stream subscriber")
+
+    async def run(self):
+        """Poll upstream for subscribed symbols until cancelled"""
+        while True:
+            await self._has_subscribers.wait()
+            symbols = self.symbols
+            if self.is_active is not None and not self.is_active():
+                symbols = [symbol for symbol in symbols if symbol not in self.latest]
+            if symbols:
+                try:
+                    self.polls += 1
+                    self.publish(await self.fetch_quotes(symbols))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Quote stream poll failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Subscriber and fan-out counters"""
+        return {
+            "subscribers": len(self.subscribers),
+            "symbols": len(self._symbol_counts),
+            "polls": self.polls,
+            "sequence": self.sequence,
+            "frames_sent": self.frames_sent,
+            "dropped": self.dropped
+        }
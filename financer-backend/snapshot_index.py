@@ -0,0 +1,99 @@
+"""
+Sort orders and filter columns over one market snapshot generation.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ("pChange", "volume", "price")
+QUOTE_FIELDS = ("symbol", "name", "lastPrice", "pChange", "change", "change_percent", "otherDetails")
+
+
+def _to_float(value: Any) -> float:
+    """Numeric value of a raw or comma-formatted quote field, NaN if unparseable"""
+    if value is None:
+        return np.nan
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return np.nan
+
+
+def _argsort(values: np.ndarray, descending: bool) -> np.ndarray:
+    """Stable sort order with missing values last in either direction"""
+    keys = -values if descending else values
+    return np.argsort(np.where(np.isnan(keys), np.inf, keys), kind="stable")
+
+
+class SnapshotIndex:
+    """Columns and precomputed sort orders for one snapshot, built once per generation"""
+
+    def __init__(self, quotes: List[Dict[str, Any]], sectors: Dict[str, Optional[str]]):
+        self.quotes = quotes
+        count = len(quotes)
+        self.columns = {
+            "price": np.fromiter((_to_float(q.get("lastPrice")) for q in quotes), np.float64, count),
+            "pChange": np.fromiter(
+                (_to_float(q.get("change_percent", q.get("pChange"))) for q in quotes), np.float64, count
+            ),
+            "volume": np.fromiter(
+                (_to_float((q.get("otherDetails") or {}).get("volume")) for q in quotes), np.float64, count
+            ),
+        }
+        self.sector_names = sorted({s for s in sectors.values() if s})
+        self._codes = {name: i for i, name in enumerate(self.sector_names)}
+        self.sector_codes = np.fromiter(
+            (self._codes.get(sectors.get(q["symbol"]), -1) for q in quotes), np.int32, count
+        )
+        self.orders: Dict[Tuple[Optional[str], str], np.ndarray] = {(None, "asc"): np.arange(count)}
+        for key in SORT_KEYS:
+            for order in ("asc", "desc"):
+                self.orders[(key, order)] = _argsort(self.columns[key], order == "desc")
+
+    def query(
+        self,
+        sort: Optional[str] = None,
+        order: str = "desc",
+        sector: Optional[str] = None,
+        min_price: Optional[float] = None,
+        skip: int = 0,
+        limit: int = 20
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of quotes matching the filters in the requested order, plus the match count"""
+        ids = self.orders[(sort, order if sort else "asc")]
+
+        mask = None
+        if sector is not None:
+            mask = self.sector_codes == self._codes.get(sector, -2)
+        if min_price is not None:
+            # NaN prices compare False and drop out
+            price_mask = self.columns["price"] >= min_price
+            mask = price_mask if mask is None else mask & price_mask
+        if mask is not None:
+            ids = ids[mask[ids]]
+
+        skip = max(skip, 0)
+        page = ids[skip:skip + max(limit, 0)]
+        return [self.quotes[i] for i in page], len(ids)
+
+
+def project_fields(quotes: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Sparse fieldset: keep only the requested keys of each quote"""
+    if not fields:
+        return quotes
+    return [{name: quote[name] for name in fields if name in quote} for quote in quotes]
+
+
+def parse_fields(text: Optional[str]) -> Optional[List[str]]:
+    """Validate a comma-separated fields parameter"""
+    if not text:
+        return None
+    fields = list(dict.fromkeys(part.strip() for part in text.split(",") if part.strip()))
+    unknown = [name for name in fields if name not in QUOTE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
@@ -3,17 +3,43 @@ Comprehensive test suite for the Financer API.
 """
 
 import asyncio
+import os
 import pytest
 import httpx
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch
 import json
-
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import main as main_module
 from main import app
 from models import SignUpSchema, LoginSchema, ChatRequest
-from nse_data import NSEDataService
-from cache import CacheService
+from nse_data import NSEDataService, UnknownSymbolError
+from cache import CacheBackend, CacheService
+from cache_codec import MAGIC, ValueCodec
 from database import DatabaseService
+from upstream import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ExecutorSaturatedError,
+    TokenBucketScheduler,
+    UpstreamExecutor,
+    upstream_lane
+)
+from ticker_search import TickerIndex, load_ticker_master
+from history_store import HistoryStore, bars_to_lists
+from quote_stream import QuoteStream
+from indicators import IndicatorEngine, parse_indicator_set
+from movers import MoversIndex
+from trading_calendar import IST, TradingCalendar, load_holidays
+from market_data import NoDataError, ProviderError, RecordingProvider, ReplayProvider, ScheduledProvider
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
 
 @pytest.fixture
@@ -117,6 +143,183 @@ class TestNSEDataService:
         assert nse_service._safe_int_parse("123.45") == 123
         assert nse_service._safe_int_parse("N/A") is None
 
+    def test_frame_to_quotes(self, nse_service):
+        """Test columnar conversion of a yf.download frame"""
+        columns = pd.MultiIndex.from_product(
+            [["AAA.NS", "BBB.NS", "CCC.NS"], ["Open", "High", "Low", "Close", "Volume"]]
+        )
+        frame = pd.DataFrame([
+            [100.0, 110.0, 95.0, 105.0, 1000.0,
+             200.0, 210.0, 190.0, float("nan"), 500.0,
+             50.0, 55.0, 45.0, 45.0, float("nan")]
+        ], columns=columns)
+
+        quotes = nse_service._frame_to_quotes(frame, ["AAA.NS", "BBB.NS", "CCC.NS", "DDD.NS"])
+
+        assert [q["symbol"] for q in quotes] == ["AAA", "CCC"]
+        assert quotes[0]["lastPrice"] == "105.00"
+        assert quotes[0]["pChange"] == "+5.00"
+        assert quotes[0]["change"] == 5.0
+        assert quotes[0]["otherDetails"]["volume"] == 1000
+        assert quotes[1]["pChange"] == "-10.00"
+        assert quotes[1]["otherDetails"]["volume"] == 0
+
+    def test_snapshot_refresh_and_page(self, nse_service):
+        """Test snapshot generations and page slicing"""
+        quotes = [{"symbol": f"S{i}"} for i in range(5)]
+        fetched = {"data": quotes, "error": None}
+
+        with patch.object(nse_service, "get_stock_data", return_value=fetched) as mock_fetch:
+            asyncio.run(nse_service.refresh_snapshot())
+            assert nse_service.snapshot.generation == nse_service.generation_base + 1
+            mock_fetch.assert_called_once_with(skip=0, limit=len(nse_service.tickers))
+
+        page = nse_service.get_snapshot_page(skip=3, limit=10)
+        assert [q["symbol"] for q in page["data"]] == ["S3", "S4"]
+        assert page["generation"] == nse_service.generation_base + 1
+        assert page["total_count"] == 5
+        assert page["has_more"] is False
+
+        # A failed refresh keeps the previous generation
+        with patch.object(nse_service, "get_stock_data", return_value={"data": [], "error": "down"}):
+            asyncio.run(nse_service.refresh_snapshot())
+        assert nse_service.snapshot.generation == nse_service.generation_base + 1
+        assert nse_service.get_snapshot_stats()["last_error"] == "down"
+
+    def test_comparison_stats(self, nse_service):
+        """Test aligned returns, correlation, volatility and drawdown"""
+        index = pd.date_range("2025-01-01", periods=5)
+        closes = pd.DataFrame({
+            "AAA": [100.0, 110.0, 99.0, 121.0, 110.0],
+            "BBB": [50.0, 55.0, 49.5, 60.5, 55.0],
+            "CCC": [10.0, np.nan, 12.0, 11.0, 13.0],
+            "DDD": [np.nan] * 5
+        }, index=index)
+
+        result = nse_service._comparison_stats(closes)
+        assert result["symbols"] == ["AAA", "BBB", "CCC"]
+        assert result["missing"] == ["DDD"]
+        # The day CCC did not trade is dropped for every symbol
+        assert result["dates"] == ["2025-01-01", "2025-01-03", "2025-01-04", "2025-01-05"]
+        assert result["returns"]["AAA"] == [0.0, -0.01, 0.21, 0.1]
+        assert result["correlation"][0][1] == 1.0
+        assert result["max_drawdown"]["AAA"] == round(110 / 121 - 1, 6)
+        assert result["total_return"]["CCC"] == 0.3
+
+        assert nse_service._comparison_stats(closes[["AAA", "DDD"]]) is None
+
+    def test_close_matrix_missing_tickers(self, nse_service):
+        """Test tickers absent from a download are reported missing, never given another's closes"""
+        index = pd.date_range("2025-01-01", periods=4)
+        bars = {
+            ticker: pd.DataFrame({"Close": closes}, index=index)
+            for ticker, closes in (("AAA.NS", [1.0, 2.0, 3.0, 2.0]), ("BBB.NS", [5.0, 4.0, 6.0, 7.0]))
+        }
+        grouped = pd.concat(bars, axis=1)
+        result = nse_service._comparison_stats(nse_service._close_matrix(grouped, ["AAA.NS", "BBB.NS", "CCC.NS"]))
+        assert result["symbols"] == ["AAA", "BBB"]
+        assert result["missing"] == ["CCC"]
+
+        # A flat frame can't be split across several tickers
+        flat = bars["AAA.NS"]
+        closes = nse_service._close_matrix(flat, ["AAA.NS", "BBB.NS"])
+        assert closes.isna().all().all()
+        assert nse_service._close_matrix(flat, ["AAA.NS"])["AAA"].tolist() == [1.0, 2.0, 3.0, 2.0]
+
+    def test_snapshot_sort_and_filter(self, nse_service):
+        """Test sorted, filtered pages keep the total_count/has_more contract"""
+        quotes = [
+            {"symbol": "TCS", "lastPrice": "3,500.00", "change_percent": 1.0, "otherDetails": {"volume": 5}},
+            {"symbol": "INFY", "lastPrice": "1,500.00", "change_percent": -1.0, "otherDetails": {"volume": 9}},
+            {"symbol": "WIPRO", "lastPrice": "450.00", "change_percent": 2.0, "otherDetails": {"volume": 1}},
+            {"symbol": "SBIN", "lastPrice": "800.00", "change_percent": None, "otherDetails": {"volume": 7}}
+        ]
+        nse_service._publish_snapshot(quotes, 0)
+
+        page = nse_service.get_snapshot_page(limit=2, sort="pChange")
+        assert [q["symbol"] for q in page["data"]] == ["WIPRO", "TCS"]
+        assert page["total_count"] == 4
+        assert page["has_more"] is True
+
+        # Missing values sort last in both directions
+        page = nse_service.get_snapshot_page(sort="pChange", order="asc")
+        assert [q["symbol"] for q in page["data"]] == ["INFY", "TCS", "WIPRO", "SBIN"]
+
+        page = nse_service.get_snapshot_page(
+            skip=1, sort="price", sector="Information Technology", min_price=1000, fields=["symbol", "lastPrice"]
+        )
+        assert page["data"] == [{"symbol": "INFY", "lastPrice": "1,500.00"}]
+        assert page["total_count"] == 2
+        assert page["has_more"] is False
+
+    def test_snapshot_change_tracking(self, nse_service):
+        """Test per-symbol change generations and delta queries"""
+        def quote(symbol, price, volume):
+            return {"symbol": symbol, "lastPrice": price, "otherDetails": {"volume": volume}}
+
+        nse_service._publish_snapshot([quote("A", "10.00", 5), quote("B", "20.00", 7)], 0)
+        nse_service._publish_snapshot([quote("A", "10.00", 5), quote("B", "20.50", 7)], 0)
+        nse_service._publish_snapshot([quote("A", "10.00", 9), quote("B", "20.50", 7)], 0)
+
+        base = nse_service.generation_base
+        assert nse_service.snapshot.changed_at == {"A": base + 3, "B": base + 2}
+        assert [q["symbol"] for q in nse_service.get_snapshot_changes(base)["data"]] == ["A", "B"]
+        assert [q["symbol"] for q in nse_service.get_snapshot_changes(base + 1)["data"]] == ["A", "B"]
+        assert [q["symbol"] for q in nse_service.get_snapshot_changes(base + 2)["data"]] == ["A"]
+        assert nse_service.get_snapshot_changes(base + 3)["changed_count"] == 0
+
+        # B leaves the universe; pollers are told instead of silently keeping it
+        nse_service._publish_snapshot([quote("A", "10.00", 9)], 0)
+        delta = nse_service.get_snapshot_changes(base + 3)
+        assert (delta["data"], delta["removed"], delta["reset"]) == ([], ["B"], False)
+
+        # Cursors from before a restart, or ahead of this process, get the whole universe
+        for since in (40, base + 99):
+            delta = nse_service.get_snapshot_changes(since)
+            assert delta["reset"] is True
+            assert [q["symbol"] for q in delta["data"]] == ["A"]
+
+        etag = nse_service.snapshot_etag("skip=0&limit=20")
+        assert etag == nse_service.snapshot_etag("skip=0&limit=20")
+        assert etag != nse_service.snapshot_etag("skip=20&limit=20")
+
+    @pytest.mark.asyncio
+    async def test_market_indices_from_local_server(self, nse_service):
+        """Test the index feed against a stand-in NSE server"""
+        with open(os.path.join(DATA_DIR, "recordings", "allIndices.json")) as f:
+            recorded = json.load(f)
+
+        requests_seen = []
+
+        async def home(request):
+            requests_seen.append(request.path)
+            return web.Response(text="ok")
+
+        async def all_indices(request):
+            requests_seen.append(request.path)
+            return web.json_response(recorded)
+
+        stand_in = web.Application()
+        stand_in.router.add_get("/", home)
+        stand_in.router.add_get("/api/allIndices", all_indices)
+
+        async with TestServer(stand_in) as server:
+            nse_service.base_url = str(server.make_url("/"))
+            nse_service.api_base = str(server.make_url("/api"))
+            nse_service.rate_limit_interval = 0
+
+            first = await nse_service.get_market_indices()
+            second = await nse_service.get_market_indices()
+            await nse_service.close()
+
+        names = [index["name"] for index in first["indices"]]
+        assert names == ["NIFTY 50", "NIFTY TOTAL MARKET", "NIFTY BANK", "NIFTY IT"]
+        assert first["indices"][0]["value"] == 25145.5
+        assert first["indices"][0]["change_percent"] == 0.43
+        assert len(second["indices"]) == 4
+        # Session is primed once and then reused
+        assert requests_seen == ["/", "/api/allIndices", "/api/allIndices"]
+
     @patch('requests.Session')
     def test_fd_calculation(self, mock_session, nse_service):
         """Test FD calculation"""
@@ -163,6 +366,996 @@ class TestCacheService:
         stats = await cache_service.get_stats()
         assert stats["keys"] == 0
 
+    @pytest.mark.asyncio
+    async def test_get_or_compute_coalesces(self, cache_service):
+        """Test concurrent misses share one computation"""
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"price": 100}
+
+        results = await asyncio.gather(*[
+            cache_service.get_or_compute("quote", fetch, ttl=60) for _ in range(10)
+        ])
+
+        assert calls == 1
+        assert all(result == {"price": 100} for result in results)
+        assert await cache_service.get("quote") == {"price": 100}
+
+        stats = await cache_service.get_stats()
+        assert stats["single_flight"]["coalesced"] == 9
+        assert stats["single_flight"]["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_get_or_compute_propagates_errors(self, cache_service):
+        """Test every waiter sees the upstream error"""
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*[
+            cache_service.get_or_compute("broken", fail) for _ in range(3)
+        ], return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await cache_service.get("broken") is None
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self, cache_service):
+        """Test expired values are served stale while one refresh runs in the background"""
+        async def fresh():
+            return {"price": 100}
+
+        async def fail():
+            raise RuntimeError("upstream down")
+
+        await cache_service.get_or_compute("quote", fresh, ttl=60, stale_ttl=600)
+        item = cache_service.memory_cache["quote"]
+        item.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        assert await cache_service.get("quote") is None
+
+        # A failing refresh does not reach callers while a stale copy exists
+        assert await cache_service.get_or_compute("quote", fail, ttl=60, stale_ttl=600) == {"price": 100, "stale": True}
+        await asyncio.sleep(0)
+        assert await cache_service.get_or_compute("quote", fail, ttl=60, stale_ttl=600) == {"price": 100, "stale": True}
+        await asyncio.sleep(0)
+
+        async def recovered():
+            return {"price": 101}
+
+        await cache_service.get_or_compute("quote", recovered, ttl=60, stale_ttl=600)
+        await asyncio.sleep(0)
+        assert await cache_service.get_or_compute("quote", fail, ttl=60, stale_ttl=600) == {"price": 101}
+
+        stats = await cache_service.get_stats()
+        assert stats["single_flight"]["stale_served"] == 3
+        assert stats["single_flight"]["revalidations"] == 3
+
+    @pytest.mark.asyncio
+    async def test_lru_bounds(self):
+        """Test the memory backend evicts least recently used entries past its limits"""
+        cache_service = CacheService(backend="memory", max_entries=3, max_bytes=60)
+        for key in ("a", "b", "c"):
+            await cache_service.set(key, {"v": key}, ttl=60)
+        await cache_service.get("a")
+        await cache_service.set("d", {"v": "d"}, ttl=60)
+        assert await cache_service.get("b") is None
+        assert await cache_service.get("a") == {"v": "a"}
+
+        # One large value pushes out older entries by size
+        await cache_service.set("big", {"v": "x" * 40}, ttl=60)
+        assert await cache_service.set("huge", {"v": "x" * 100}, ttl=60) is False
+
+        stats = await cache_service.get_stats()
+        assert stats["keys"] == len(cache_service.memory_cache)
+        assert stats["resident_bytes"] <= 60
+        assert stats["evictions"] >= 2
+        assert stats["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_tiered_invalidation(self):
+        """Test two tiered workers share Redis and drop stale L1 entries on each other's writes"""
+        if os.getenv("REDIS_TEST_URL"):
+            import redis.asyncio as aioredis
+            clients = [aioredis.from_url(os.environ["REDIS_TEST_URL"]) for _ in range(2)]
+        else:
+            fakeredis = pytest.importorskip("fakeredis")
+            server = fakeredis.FakeServer()
+            clients = [fakeredis.aioredis.FakeRedis(server=server) for _ in range(2)]
+        writer, reader = (CacheService(backend="tiered", redis_client=client, l1_ttl=60) for client in clients)
+        listeners = [asyncio.create_task(cache.run_invalidation_listener()) for cache in (writer, reader)]
+        try:
+            for _ in range(100):
+                if writer._l1_enabled and reader._l1_enabled:
+                    break
+                await asyncio.sleep(0.01)
+            await writer.clear()
+
+            await writer.set("quote", {"price": 1}, ttl=60)
+            assert await reader.get("quote") == {"price": 1}
+            assert await reader.get("quote") == {"price": 1}
+            stats = await reader.get_stats()
+            assert stats["tiers"]["l2_hits"] == 1
+            assert stats["tiers"]["l1_hits"] == 1
+
+            await writer.set("quote", {"price": 2}, ttl=60)
+            for _ in range(100):
+                if "quote" not in reader.memory_cache:
+                    break
+                await asyncio.sleep(0.01)
+            assert await reader.get("quote") == {"price": 2}
+
+            await writer.delete("quote")
+            await asyncio.sleep(0.05)
+            assert await reader.get("quote") is None
+
+            await writer.set_many({"stock_detail:TCS": {"price": 1}, "stock_detail:INFY": {"price": 2}}, ttl=60)
+            assert len(await reader.get_many(["stock_detail:TCS", "stock_detail:INFY"])) == 2
+            await writer.delete_namespace("stock_detail")
+            await asyncio.sleep(0.05)
+            assert "stock_detail:TCS" not in reader.memory_cache
+            assert await reader.get_many(["stock_detail:TCS", "stock_detail:INFY"]) == {}
+            assert (await reader.get_stats())["tiers"]["invalidations_received"] >= 2
+        finally:
+            for task in listeners:
+                task.cancel()
+            await asyncio.gather(*listeners, return_exceptions=True)
+
+    @pytest.mark.asyncio
+    async def test_encoded_hits_skip_encoding(self, cache_service):
+        """Test encoded gets return the stored bytes and stay in step with object gets"""
+        async def fetch():
+            return {"price": np.float64(100.5), "volume": np.int64(7)}
+
+        body = await cache_service.get_or_compute_encoded("quote", fetch, ttl=60, stale_ttl=600)
+        assert json.loads(body) == {"price": 100.5, "volume": 7}
+        assert await cache_service.get_encoded("quote") is cache_service.memory_cache["quote"].encoded
+        assert await cache_service.get("quote") == {"price": 100.5, "volume": 7}
+
+        cache_service.memory_cache["quote"].expires_at = datetime.utcnow() - timedelta(seconds=1)
+        stale = await cache_service.get_or_compute_encoded("quote", fetch, ttl=60, stale_ttl=600)
+        assert json.loads(stale)["stale"] is True
+
+    def test_value_codec(self):
+        """Test compression above the threshold and plain reads of uncompressed values"""
+        codec = ValueCodec(min_bytes=64, algorithm="zlib")
+        large = json.dumps([{"symbol": f"SYM{i}", "lastPrice": "1,234.50"} for i in range(100)]).encode()
+        stored = codec.encode(large)
+        assert stored.startswith(MAGIC + b"d")
+        assert codec.decode(stored) == large
+
+        small = b'{"price":1}'
+        assert codec.encode(small) == small
+        # Entries written as text before compression existed
+        assert codec.decode('{"price":1}') == small
+
+        stats = codec.get_stats()
+        assert stats["compressed"] == 1 and stats["stored_plain"] == 1
+        assert stats["ratio"] > 5
+        with pytest.raises(ValueError):
+            codec.decode(MAGIC + b"?" + b"junk")
+
+    @pytest.mark.asyncio
+    async def test_redis_compressed_values(self):
+        """Test large values are stored compressed in Redis and read back transparently"""
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.aioredis.FakeRedis()
+        cache_service = CacheService(backend="redis", redis_client=client, compress_min_bytes=64)
+        value = {"data": [{"symbol": f"SYM{i}", "lastPrice": "1,234.50"} for i in range(100)]}
+
+        await cache_service.set("page", value, ttl=60, stale_ttl=60)
+        assert (await client.get("financer:page")).startswith(MAGIC)
+        assert await cache_service.get("page") == value
+        assert await cache_service.get_stale("page") == value
+
+        await client.set("financer:legacy", json.dumps({"price": 1}))
+        assert await cache_service.get("legacy") == {"price": 1}
+        assert (await cache_service.get_stats())["compression"]["compressed"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("backend", ["memory", "redis"])
+    async def test_batch_operations(self, backend):
+        """Test get_many/set_many/delete_many and namespace deletes on both backends"""
+        if backend == "redis":
+            fakeredis = pytest.importorskip("fakeredis")
+            cache_service = CacheService(backend="redis", redis_client=fakeredis.aioredis.FakeRedis())
+        else:
+            cache_service = CacheService(backend="memory")
+
+        quotes = {f"stock_detail:{symbol}": {"symbol": symbol} for symbol in ("TCS", "INFY", "SBIN")}
+        assert await cache_service.set_many(quotes, ttl=60, stale_ttl=60)
+        await cache_service.set("market_indices", {"indices": []}, ttl=60)
+
+        found = await cache_service.get_many(["stock_detail:TCS", "stock_detail:SBIN", "stock_detail:HDFC"])
+        assert found == {"stock_detail:TCS": {"symbol": "TCS"}, "stock_detail:SBIN": {"symbol": "SBIN"}}
+
+        await cache_service.delete_many(["stock_detail:TCS"])
+        assert await cache_service.get("stock_detail:TCS") is None
+        assert await cache_service.get_stale("stock_detail:TCS") is None
+
+        # Stale copies go too but count once per entry
+        assert await cache_service.delete_namespace("stock_detail") == 2
+        assert await cache_service.get_many(list(quotes)) == {}
+        assert await cache_service.get_stale("stock_detail:INFY") is None
+        assert await cache_service.get("market_indices") == {"indices": []}
+
+        # Glob characters in a namespace match only themselves
+        await cache_service.set_many({"a*:x": 1, "ab:x": 2}, ttl=60)
+        assert await cache_service.delete_namespace("a*") == 1
+        assert await cache_service.get("ab:x") == 2
+
+        await cache_service.clear()
+        assert await cache_service.get("market_indices") is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("backend", ["memory", "redis"])
+    async def test_tag_invalidation(self, backend):
+        """Test invalidate_tag drops exactly the keys set with that tag on both backends"""
+        if backend == "redis":
+            fakeredis = pytest.importorskip("fakeredis")
+            client = fakeredis.aioredis.FakeRedis()
+            cache_service = CacheService(backend="redis", redis_client=client)
+        else:
+            cache_service = CacheService(backend="memory")
+
+        await cache_service.set("stock_detail:TCS", {"symbol": "TCS"}, ttl=60, stale_ttl=60, tags=["symbol:TCS"])
+        await cache_service.set("stock_detail:INFY", {"symbol": "INFY"}, ttl=60, tags=["symbol:INFY"])
+        await cache_service.set(
+            "stock_compare:INFY,TCS:1y", {"symbols": []}, ttl=60, tags=["symbol:INFY", "symbol:TCS"]
+        )
+
+        assert await cache_service.invalidate_tag("symbol:TCS") == 2
+        assert await cache_service.get("stock_detail:TCS") is None
+        assert await cache_service.get_stale("stock_detail:TCS") is None
+        assert await cache_service.get("stock_compare:INFY,TCS:1y") is None
+        assert await cache_service.get("stock_detail:INFY") == {"symbol": "INFY"}
+        assert await cache_service.invalidate_tag("symbol:TCS") == 0
+
+        # Deletes and other tags trim the memory index; on Redis members stay in a tag set until it
+        # expires or the tag is invalidated, which then unlinks nothing
+        await cache_service.delete("stock_detail:INFY")
+        if backend == "memory":
+            assert cache_service.memory_cache.get_stats()["tags"] == 0
+        else:
+            assert await client.smembers("financer:tag:symbol:INFY") == {
+                b"stock_detail:INFY", b"stock_compare:INFY,TCS:1y"
+            }
+        assert await cache_service.invalidate_tag("symbol:INFY") == 0
+
+    @pytest.mark.parametrize("backend", ["redis", "tiered"])
+    def test_backend_given_as_string(self, backend):
+        """Test a backend named by string still gets a Redis client"""
+        cache_service = CacheService(backend=backend)
+        assert cache_service.backend == CacheBackend(backend)
+        assert cache_service.redis_client is not None
+        assert cache_service._uses_redis
+
+    @pytest.mark.asyncio
+    async def test_tag_invalidation_during_compute(self, cache_service):
+        """Test a computation running when its tag is invalidated does not cache its result"""
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                await release.wait()
+                return {"price": "before"}
+            return {"price": "after"}
+
+        pending = asyncio.create_task(
+            cache_service.get_or_compute("stock_detail:TCS", fetch, ttl=600, tags=["symbol:TCS"])
+        )
+        await asyncio.sleep(0)
+        assert await cache_service.invalidate_tag("symbol:TCS") == 0
+
+        # A caller after the invalidation does not join the outdated computation
+        assert await cache_service.get_or_compute(
+            "stock_detail:TCS", fetch, ttl=600, tags=["symbol:TCS"]
+        ) == {"price": "after"}
+        release.set()
+        assert await pending == {"price": "before"}
+        assert await cache_service.get("stock_detail:TCS") == {"price": "after"}
+        assert not cache_service._inflight and not cache_service._inflight_tags
+
+    @pytest.mark.asyncio
+    async def test_tag_ttl_without_expire_flags(self):
+        """Test tag sets keep their longest member TTL on Redis 6, which has no EXPIRE NX/GT"""
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.aioredis.FakeRedis(version=6)
+        cache_service = CacheService(backend="redis", redis_client=client)
+
+        assert await cache_service.set("stock_detail:TCS", {"symbol": "TCS"}, ttl=60, tags=["symbol:TCS"])
+        assert 0 < await client.ttl("financer:tag:symbol:TCS") <= 60
+        assert await cache_service.set(
+            "stock_compare:INFY,TCS:1y", {"symbols": []}, ttl=600, stale_ttl=300, tags=["symbol:TCS"]
+        )
+        assert 600 < await client.ttl("financer:tag:symbol:TCS") <= 900
+        # A shorter-lived member must not cut the set's lifetime
+        assert await cache_service.set("stock_detail:TCS", {"symbol": "TCS"}, ttl=30, tags=["symbol:TCS"])
+        assert await client.ttl("financer:tag:symbol:TCS") > 600
+        assert await cache_service.invalidate_tag("symbol:TCS") == 2
+
+    @pytest.mark.asyncio
+    async def test_namespace_metrics(self):
+        """Test hits, misses, stale serves, sets and evictions are counted per key namespace"""
+        cache_service = CacheService(backend="memory", max_entries=2)
+        await cache_service.set("stock_detail:TCS", {"price": 1}, ttl=60, stale_ttl=600)
+        await cache_service.get("stock_detail:TCS")
+        await cache_service.get("stock_detail:INFY")
+        await cache_service.set("market_indices", {"indices": []}, ttl=60)
+        await cache_service.set("stock_compare:INFY,TCS:1y", {"symbols": []}, ttl=60)
+
+        stats = await cache_service.get_stats()
+        assert "items" not in stats
+        detail = stats["namespaces"]["stock_detail"]
+        assert (detail["hits"], detail["misses"], detail["sets"], detail["evictions"]) == (1, 1, 1, 1)
+        assert detail["hit_ratio"] == 0.5
+        assert detail["latency_ms"]["get"]["count"] == 2
+
+        text = cache_service.render_metrics()
+        assert 'financer_cache_hits_total{namespace="stock_detail"} 1' in text
+        assert 'financer_cache_operation_seconds_count{namespace="market_indices",operation="set"} 1' in text
+        assert "financer_cache_resident_keys 2" in text
+
+    @pytest.mark.asyncio
+    async def test_reclaim_expired(self, cache_service):
+        """Test expired entries are reclaimed without being read again"""
+        await cache_service.set("short", 1, ttl=60)
+        await cache_service.set("stale", 2, ttl=60, stale_ttl=600)
+        await cache_service.set("long", 3, ttl=3600)
+        # Rewriting a key leaves a dead heap entry that must not remove the new value
+        await cache_service.set("short", 4, ttl=3600)
+
+        later = datetime.utcnow() + timedelta(seconds=120)
+        assert cache_service.memory_cache.reclaim(later) == 0
+        assert cache_service.memory_cache.reclaim(later + timedelta(seconds=600)) == 1
+        assert "stale" not in cache_service.memory_cache
+        assert await cache_service.get("short") == 4
+        assert (await cache_service.get_stats())["expirations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_warm_start_roundtrip(self, cache_service, tmp_path):
+        """Test saved entries reload with their remaining TTL, stale window and LRU order"""
+        path = str(tmp_path / "cache.jsonl.gz")
+        await cache_service.set("stock_detail:TCS", {"price": 3500.5}, ttl=600)
+        await cache_service.set("market_indices", [{"name": "NIFTY 50"}], ttl=60, stale_ttl=900)
+        async def compute():
+            return {"ok": True}
+
+        await cache_service.get_or_compute_encoded("stock_compare:INFY,TCS:1y", compute, ttl=300)
+        await cache_service.set("expired", 1, ttl=60)
+        cache_service.memory_cache.get("expired").expires_at = datetime.utcnow() - timedelta(seconds=1)
+        await cache_service.get("stock_detail:TCS")
+
+        assert await cache_service.save(path) == 3
+
+        restored = CacheService(backend="memory")
+        assert await restored.load(path) == 3
+        assert list(restored.memory_cache.keys()) == [
+            "market_indices", "stock_compare:INFY,TCS:1y", "stock_detail:TCS"
+        ]
+        assert await restored.get("stock_detail:TCS") == {"price": 3500.5}
+        remaining = (restored.memory_cache.get("stock_detail:TCS").expires_at - datetime.utcnow()).total_seconds()
+        assert 590 < remaining <= 600
+        assert restored.memory_cache.get("market_indices").stale_until is not None
+        assert restored.memory_cache.get("stock_compare:INFY,TCS:1y").encoded == b'{"ok":true}'
+        assert await CacheService(backend="memory").load(str(tmp_path / "missing.gz")) == 0
+
+
+class TestTickerSearch:
+    """Test ticker master and search index"""
+
+    @pytest.fixture
+    def ticker_index(self):
+        """Index over the bundled ticker master"""
+        return TickerIndex(load_ticker_master(os.path.join(DATA_DIR, "nse_equity_master.csv.gz")))
+
+    def test_master_loaded(self, ticker_index):
+        """Test the bundled master covers the default universe with names"""
+        symbols = {record.symbol for record in ticker_index.records}
+        assert {"RELIANCE", "TCS", "M&M", "BAJAJ-AUTO"} <= symbols
+        assert ticker_index.get_stats()["symbols"] == len(ticker_index.records)
+
+    def test_search_ranking(self, ticker_index):
+        """Test exact, prefix, name and typo matches"""
+        assert ticker_index.search("tcs")[0]["symbol"] == "TCS"
+        assert ticker_index.search("RELI")[0]["symbol"] == "RELIANCE"
+        assert ticker_index.search("infosys")[0]["symbol"] == "INFY"
+        assert ticker_index.search("relaince")[0]["symbol"] == "RELIANCE"
+        assert ticker_index.search("  ") == []
+        assert len(ticker_index.search("bank", limit=3)) == 3
+
+    def test_search_endpoint(self, client):
+        """Test /stocks/search is not shadowed by /stocks/{symbol}"""
+        response = client.get("/stocks/search", params={"q": "hdfc bank"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["results"][0]["symbol"] == "HDFCBANK"
+        assert data["count"] == len(data["results"])
+
+
+class TestHistoryStore:
+    """Test columnar OHLCV history store"""
+
+    @staticmethod
+    def make_bars(start, days):
+        dates = np.arange(np.datetime64(start), np.datetime64(start) + days)
+        closes = np.arange(days, dtype=float) + 100
+        return {
+            "date": dates,
+            "open": closes - 1,
+            "high": closes + 1,
+            "low": closes - 2,
+            "close": closes,
+            "volume": np.full(days, 1000.0)
+        }
+
+    def test_append_and_range_read(self, tmp_path):
+        """Test append-only writes and range slicing"""
+        store = HistoryStore(str(tmp_path))
+        assert store.last_date("TCS") is None
+
+        assert store.append("TCS", self.make_bars("2025-01-01", 10)) == 10
+        # Overlapping batch only appends the new days
+        assert store.append("TCS", self.make_bars("2025-01-06", 10)) == 5
+        assert store.last_date("TCS") == date(2025, 1, 15)
+
+        bars = store.read("TCS", date(2025, 1, 3), date(2025, 1, 5))
+        assert bars_to_lists(bars)["date"] == ["2025-01-03", "2025-01-04", "2025-01-05"]
+        assert bars["close"].tolist() == [102.0, 103.0, 104.0]
+        assert isinstance(bars["close"], np.memmap)
+
+    def test_weekly_resample(self, tmp_path):
+        """Test weekly aggregation from daily bars"""
+        store = HistoryStore(str(tmp_path))
+        # 2025-01-06 is a Monday
+        store.append("INFY", self.make_bars("2025-01-06", 14))
+
+        weekly = store.read("INFY", interval="1wk")
+        assert bars_to_lists(weekly)["date"] == ["2025-01-06", "2025-01-13"]
+        assert weekly["open"].tolist() == [99.0, 106.0]
+        assert weekly["close"].tolist() == [106.0, 113.0]
+        assert weekly["high"].tolist() == [107.0, 114.0]
+        assert weekly["volume"].tolist() == [7000, 7000]
+
+    @pytest.mark.asyncio
+    async def test_service_fetches_missing_days_once(self, tmp_path):
+        """Test history is downloaded once and then served locally"""
+        service = NSEDataService()
+        service.history = HistoryStore(str(tmp_path))
+        bars = self.make_bars("2025-01-01", 5)
+
+        with patch.object(service, "_download_history", return_value=bars) as mock_download:
+            first = await service.get_history("tcs")
+            second = await service.get_history("TCS", start=date(2025, 1, 4))
+
+        assert mock_download.call_count == 1
+        assert len(first["date"]) == 5
+        assert second["close"].tolist() == [103.0, 104.0]
+
+    @pytest.mark.asyncio
+    async def test_unknown_symbols_never_backfilled(self, tmp_path):
+        """Test symbols outside the ticker master are rejected before any download or lock"""
+        service = NSEDataService()
+        service.history = HistoryStore(str(tmp_path))
+
+        with patch.object(service, "_download_history") as mock_download:
+            for symbol in ("ZZZ1", "..", "../etc"):
+                with pytest.raises(UnknownSymbolError):
+                    await service.get_history(symbol)
+        mock_download.assert_not_called()
+        assert service._history_locks == {}
+        with pytest.raises(ValueError):
+            service.history.last_date("..")
+
+
+class TestIndicators:
+    """Test technical indicator engine"""
+
+    @staticmethod
+    def make_bars(days, seed=3):
+        rng = np.random.default_rng(seed)
+        close = 100 + np.cumsum(rng.normal(0, 1, days))
+        return {
+            "date": np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-01") + days),
+            "open": close - 0.5,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": rng.integers(1000, 5000, days)
+        }
+
+    def test_matches_pandas_reference(self):
+        """Test rolling indicators against pandas implementations"""
+        bars = self.make_bars(120)
+        close = pd.Series(bars["close"])
+        engine = IndicatorEngine()
+        sma_spec, bb_spec, rsi_spec = parse_indicator_set("sma:20,bb:20:2,rsi")
+
+        sma = engine.compute("TCS", sma_spec, bars)["value"]
+        np.testing.assert_allclose(sma, close.rolling(20).mean().to_numpy(), equal_nan=True)
+
+        bands = engine.compute("TCS", bb_spec, bars)
+        upper = close.rolling(20).mean() + 2 * close.rolling(20).std(ddof=0)
+        np.testing.assert_allclose(bands["upper"], upper.to_numpy(), equal_nan=True)
+
+        rsi = engine.compute("TCS", rsi_spec, bars)["value"]
+        assert np.isnan(rsi[:14]).all()
+        assert ((rsi[14:] >= 0) & (rsi[14:] <= 100)).all()
+
+    def test_incremental_matches_full_recompute(self):
+        """Test a new bar extends cached results instead of recomputing everything"""
+        bars = self.make_bars(200)
+        specs = parse_indicator_set("sma:10,ema:12,rsi:14,macd:12:26:9,bb,vwap:5")
+        engine = IndicatorEngine()
+
+        for spec in specs:
+            engine.compute("INFY", spec, {k: v[:-3] for k, v in bars.items()})
+        assert engine.get_stats()["full"] == len(specs)
+
+        for spec in specs:
+            incremental = engine.compute("INFY", spec, bars)
+            full = IndicatorEngine().compute("INFY", spec, bars)
+            for name, values in full.items():
+                np.testing.assert_allclose(incremental[name], values, equal_nan=True)
+
+        engine.compute("INFY", specs[0], bars)
+        stats = engine.get_stats()
+        assert stats["incremental"] == len(specs)
+        assert stats["hits"] == 1
+
+    def test_parse_indicator_set(self):
+        """Test defaults, labels and validation of the set parameter"""
+        specs = parse_indicator_set("sma,macd:8:21:5,bb:20:2.5,sma")
+        assert [spec.label for spec in specs] == ["sma_20", "macd_8_21_5", "bb_20_2.5"]
+
+        for text in ("foo", "sma:0", "sma:x", "rsi:14:2", "macd:26:12", ""):
+            with pytest.raises(ValueError):
+                parse_indicator_set(text)
+
+    def test_indicators_endpoint(self, client, tmp_path, monkeypatch):
+        """Test the endpoint slices results computed over the full history"""
+        service = main_module.nse_service
+        monkeypatch.setattr(service, "history", HistoryStore(str(tmp_path)))
+        service.history.append("SBIN", self.make_bars(60))
+        service._history_checked["SBIN"] = date.today()
+
+        response = client.get("/stocks/SBIN/indicators?set=sma:5,macd&from=2024-02-01")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["date"][0] == "2024-02-01"
+        assert data["count"] == len(data["indicators"]["sma_5"]["value"]) == 29
+        assert set(data["indicators"]["macd_12_26_9"]) == {"macd", "signal", "histogram"}
+
+        assert client.get("/stocks/SBIN/indicators?set=nope").status_code == 400
+
+
+class TestMoversIndex:
+    """Test top-K movers rankings"""
+
+    @staticmethod
+    def make_quotes(count, seed=11):
+        rng = np.random.default_rng(seed)
+        return [
+            {
+                "symbol": f"S{i:03d}",
+                "change_percent": float(rng.normal(0, 2)),
+                "otherDetails": {"volume": int(rng.integers(1, 10**6))}
+            }
+            for i in range(count)
+        ]
+
+    def test_rankings_match_full_sort(self):
+        """Test partial selection agrees with sorting the whole universe"""
+        quotes = self.make_quotes(300)
+        sectors = {q["symbol"]: ("IT" if i % 3 else "Banks") for i, q in enumerate(quotes)}
+        movers = MoversIndex(sectors, depth=20)
+        movers.update(quotes, {q["symbol"] for q in quotes}, 1)
+
+        by_change = sorted(quotes, key=lambda q: q["change_percent"], reverse=True)
+        assert movers.top("gainers", 10) == by_change[:10]
+        assert movers.top("losers", 5) == by_change[::-1][:5]
+
+        banks = [q for q in quotes if sectors[q["symbol"]] == "Banks"]
+        by_volume = sorted(banks, key=lambda q: q["otherDetails"]["volume"], reverse=True)
+        assert movers.top("volume", 20, "Banks") == by_volume[:20]
+        assert movers.top("gainers", 10, "Unknown") == []
+
+    def test_incremental_patch(self):
+        """Test changed quotes are patched in without a rebuild"""
+        quotes = self.make_quotes(100)
+        movers = MoversIndex({}, depth=10)
+        movers.update(quotes, {q["symbol"] for q in quotes}, 1)
+
+        updated = [dict(q) for q in quotes]
+        updated[42] = {**updated[42], "change_percent": 50.0}
+        updated[7] = {**updated[7], "change_percent": None}
+        movers.update(updated, {"S042", "S007"}, 2)
+
+        assert movers.top("gainers", 1)[0]["symbol"] == "S042"
+        assert all(q["symbol"] != "S007" for q in movers.top("losers", 10))
+        stats = movers.get_stats()
+        assert stats["rebuilds"] == 1
+        assert stats["patches"] == 1
+
+    def test_movers_endpoint(self, client):
+        """Test the endpoint serves rankings for the current snapshot"""
+        quotes = [
+            {"symbol": "TCS", "lastPrice": "1.00", "change_percent": 1.5, "otherDetails": {"volume": 10}},
+            {"symbol": "INFY", "lastPrice": "2.00", "change_percent": -2.0, "otherDetails": {"volume": 30}},
+            {"symbol": "HDFCBANK", "lastPrice": "3.00", "change_percent": 0.5, "otherDetails": {"volume": 20}}
+        ]
+        main_module.nse_service._publish_snapshot(quotes, 0)
+
+        data = client.get("/stocks/movers?by=losers&k=2").json()
+        assert [q["symbol"] for q in data["data"]] == ["INFY", "HDFCBANK"]
+        assert data["generation"] == main_module.nse_service.snapshot.generation
+
+        data = client.get("/stocks/movers?by=volume&sector=Information Technology").json()
+        assert [q["symbol"] for q in data["data"]] == ["INFY", "TCS"]
+        assert client.get("/stocks/movers?by=price").status_code == 422
+
+
+class TestReplayProvider:
+    """Test offline market data replay"""
+
+    @staticmethod
+    def write_recording(root):
+        frames = [
+            {"quotes": {"TCS.NS": {"Open": 100.0, "High": 102.0, "Low": 99.0, "Close": 101.0, "Volume": 10.0}}},
+            {"quotes": {"TCS.NS": {"Open": 101.0, "High": 104.0, "Low": 100.0, "Close": 103.0, "Volume": 20.0}}}
+        ]
+        with open(os.path.join(root, "quotes.jsonl"), "w") as f:
+            f.write("\n".join(json.dumps(frame) for frame in frames) + "\n")
+
+    @pytest.mark.asyncio
+    async def test_recorded_and_synthetic_quotes(self, tmp_path):
+        """Test recorded bars loop per ticker and unrecorded tickers are deterministic"""
+        self.write_recording(str(tmp_path))
+        replay = ReplayProvider(str(tmp_path), seed=1)
+        closes = []
+        for _ in range(3):
+            frame = await replay.get_quote_frame(["TCS.NS", "ZZZ.NS"])
+            closes.append((frame["TCS.NS"]["Close"].iloc[-1], frame["ZZZ.NS"]["Close"].iloc[-1]))
+
+        assert [tcs for tcs, _ in closes] == [101.0, 103.0, 101.0]
+        again = await ReplayProvider(str(tmp_path), seed=1).get_quote_frame(["ZZZ.NS"])
+        assert again["ZZZ.NS"]["Close"].iloc[-1] == closes[0][1]
+
+    @pytest.mark.asyncio
+    async def test_service_runs_offline(self, tmp_path):
+        """Test the snapshot, history, comparison and indices paths against replay"""
+        service = NSEDataService()
+        service.provider = service.universe_provider = ReplayProvider(os.path.join(DATA_DIR, "recordings"))
+        service.history = HistoryStore(str(tmp_path))
+
+        snapshot = await service.refresh_snapshot()
+        assert len(snapshot.data) == len(service.tickers)
+
+        bars = await service.get_history("TCS")
+        assert len(bars["date"]) > 1000
+
+        comparison = await service.compare_stocks(["TCS", "INFY"], "6mo")
+        assert comparison["symbols"] == ["TCS", "INFY"]
+
+        indices = await service.get_market_indices()
+        assert len(indices["indices"]) == 4
+        await service.close()
+
+    @pytest.mark.asyncio
+    async def test_latency_and_error_injection(self, tmp_path):
+        """Test injected failures surface as ProviderError and are counted"""
+        replay = ReplayProvider(str(tmp_path), latency=0.01, error_rate=1.0)
+        with pytest.raises(ProviderError):
+            await replay.get_quote_frame(["TCS.NS"])
+        stats = replay.get_stats()
+        assert stats["calls"] == 1
+        assert stats["injected_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_recording_round_trip(self, tmp_path):
+        """Test frames captured by the recorder replay identically"""
+        source = ReplayProvider(str(tmp_path / "source"), seed=5)
+        recorder = RecordingProvider(source, str(tmp_path / "recorded"))
+        live = await recorder.get_quote_frame(["INFY.NS", "SBIN.NS"])
+
+        replayed = await ReplayProvider(str(tmp_path / "recorded"), seed=99).get_quote_frame(["INFY.NS", "SBIN.NS"])
+        assert replayed["SBIN.NS"]["Close"].iloc[-1] == live["SBIN.NS"]["Close"].iloc[-1]
+
+
+class TestCircuitBreaker:
+    """Test upstream circuit breaker"""
+
+    @pytest.mark.asyncio
+    async def test_open_half_open_close(self):
+        """Test the breaker opens on failures, probes after the cool-down and recovers"""
+        now = [0.0]
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+
+        async def fail():
+            raise RuntimeError("down")
+
+        async def ok():
+            return "ok"
+
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await breaker.call(fail)
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+
+        # A failed probe restarts the cool-down
+        now[0] = 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(RuntimeError):
+            await breaker.call(fail)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        now[0] = 20
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        stats = breaker.get_stats()
+        assert stats["transitions"] == {"closed->open": 1, "open->half_open": 2, "half_open->open": 1, "half_open->closed": 1}
+        assert stats["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_excluded_errors_not_counted(self):
+        """Test excluded errors reach the caller without opening the circuit"""
+        breaker = CircuitBreaker("test", failure_threshold=1, excluded=(NoDataError,))
+
+        async def empty():
+            raise NoDataError("No quotes returned for 2 tickers")
+
+        for _ in range(3):
+            with pytest.raises(NoDataError):
+                await breaker.call(empty)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.get_stats()["failures"] == 0
+
+    @pytest.mark.asyncio
+    async def test_user_calls_cannot_open_universe_breaker(self, tmp_path):
+        """Test failing per-user calls trip their own breaker while the snapshot keeps refreshing"""
+        service = NSEDataService()
+        service.universe_provider.inner = ReplayProvider(str(tmp_path))
+        service.provider.inner = ReplayProvider(str(tmp_path), error_rate=1.0)
+
+        for _ in range(service.breaker.failure_threshold):
+            await service._poll_stream_quotes(["ZZZ1", "ZZZ2"])
+        assert service.breaker.state == CircuitBreaker.OPEN
+
+        await service.refresh_snapshot()
+        assert service.universe_breaker.state == CircuitBreaker.CLOSED
+        assert service.snapshot.generation == service.generation_base + 1
+
+    @pytest.mark.asyncio
+    async def test_service_keeps_stale_snapshot(self, tmp_path):
+        """Test failing refreshes trip the breaker and the last snapshot is marked stale"""
+        service = NSEDataService()
+        replay = ReplayProvider(str(tmp_path))
+        service.universe_provider.inner = replay
+        await service.refresh_snapshot()
+        generation = service.snapshot.generation
+
+        replay.error_rate = 1.0
+        for _ in range(service.universe_breaker.failure_threshold):
+            await service.refresh_snapshot()
+        assert service.universe_breaker.state == CircuitBreaker.OPEN
+
+        calls = replay.calls
+        await service.refresh_snapshot()
+        assert replay.calls == calls
+
+        page = service.get_snapshot_page()
+        assert page["generation"] == generation
+        assert page["stale"] is True
+
+
+class TestTokenBucketScheduler:
+    """Test upstream rate scheduler"""
+
+    @pytest.mark.asyncio
+    async def test_priority_lanes(self):
+        """Test queued interactive callers are served before refreshes and backfills"""
+        scheduler = TokenBucketScheduler("test", rate=100, burst=1)
+        await scheduler.acquire("interactive")
+        order = []
+
+        async def call(lane):
+            await scheduler.acquire(lane)
+            order.append(lane)
+
+        tasks = [asyncio.create_task(call(lane)) for lane in ("backfill", "refresh", "interactive", "backfill")]
+        await asyncio.gather(*tasks)
+        assert order == ["interactive", "refresh", "backfill", "backfill"]
+
+        stats = scheduler.get_stats()["lanes"]
+        assert stats["backfill"]["max_depth"] == 2
+        assert stats["backfill"]["granted"] == 2
+        assert stats["backfill"]["max_wait_ms"] >= stats["interactive"]["max_wait_ms"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_and_lane_context(self, tmp_path):
+        """Test cancelled waiters release their place and lanes follow the calling context"""
+        scheduler = TokenBucketScheduler("test", rate=50, burst=1)
+        await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire("refresh"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.05)
+        assert scheduler.get_stats()["lanes"]["refresh"]["cancelled"] == 1
+
+        provider = ScheduledProvider(ReplayProvider(str(tmp_path)), scheduler)
+        with upstream_lane("backfill"):
+            await provider.get_history_frame(["TCS.NS"], period="1mo")
+        assert scheduler.get_stats()["lanes"]["backfill"]["granted"] == 1
+        with pytest.raises(ValueError):
+            await scheduler.acquire("bulk")
+
+
+class TestUpstreamExecutor:
+    """Test bounded upstream executor"""
+
+    @pytest.mark.asyncio
+    async def test_run_and_stats(self):
+        """Test blocking calls run off the loop and are counted"""
+        executor = UpstreamExecutor("test", max_workers=2, max_queue=2)
+        results = await asyncio.gather(*[executor.run(lambda i=i: i * 2) for i in range(4)])
+        assert results == [0, 2, 4, 6]
+
+        stats = executor.get_stats()
+        assert stats["completed"] == 4
+        assert stats["active"] == 0
+        assert stats["queued"] == 0
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_saturation_and_timeout(self):
+        """Test queue-depth rejection and per-call timeouts"""
+        executor = UpstreamExecutor("test", max_workers=1, max_queue=0)
+        release = threading.Event()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(release.wait, timeout=0.05)
+
+        # The timed-out call still occupies the only slot
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(lambda: None)
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert await executor.run(lambda: "ok") == "ok"
+
+        stats = executor.get_stats()
+        assert stats["timed_out"] == 1
+        assert stats["rejected"] == 1
+        executor.shutdown()
+
+
+class TestQuoteStream:
+    """Test live quote fan-out"""
+
+    @staticmethod
+    def quote(symbol, price):
+        return {"symbol": symbol, "lastPrice": f"{price:,.2f}", "otherDetails": {"volume": 100}}
+
+    @pytest.mark.asyncio
+    async def test_fan_out_changed_quotes(self):
+        """Test each subscriber only receives changes for its own symbols"""
+        stream = QuoteStream(fetch_quotes=None, queue_size=4)
+        first = stream.subscribe(["TCS", "INFY"])
+        second = stream.subscribe(["INFY"])
+        assert stream.symbols == ["INFY", "TCS"]
+
+        stream.publish([self.quote("TCS", 10), self.quote("INFY", 20)])
+        assert [q["symbol"] for q in first.queue.get_nowait()["data"]] == ["TCS", "INFY"]
+        assert [q["symbol"] for q in second.queue.get_nowait()["data"]] == ["INFY"]
+
+        # Unchanged INFY is not resent
+        assert stream.publish([self.quote("TCS", 11), self.quote("INFY", 20)]) == 1
+        assert first.queue.get_nowait()["data"][0]["lastPrice"] == "11.00"
+        assert second.queue.empty()
+
+        # Late joiners start from the last known quotes
+        late = stream.subscribe(["TCS"])
+        assert late.queue.get_nowait()["data"][0]["lastPrice"] == "11.00"
+
+        stream.unsubscribe(first)
+        stream.unsubscribe(late)
+        assert stream.symbols == ["INFY"]
+
+    @pytest.mark.asyncio
+    async def test_single_upstream_poll(self):
+        """Test one fetch covers the union of all subscriptions"""
+        calls = []
+
+        async def fetch(symbols):
+            calls.append(symbols)
+            return [self.quote(symbol, 1) for symbol in symbols]
+
+        stream = QuoteStream(fetch, interval=0.01)
+        subscribers = [stream.subscribe(["TCS"]) for _ in range(50)] + [stream.subscribe(["INFY", "TCS"])]
+        task = asyncio.create_task(stream.run())
+        await asyncio.sleep(0.005)
+        task.cancel()
+
+        assert calls[0] == ["INFY", "TCS"]
+        assert len(calls) == 1
+        assert all(s.queue.qsize() == 1 for s in subscribers)
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_dropped(self):
+        """Test a full queue disconnects the subscriber instead of growing"""
+        stream = QuoteStream(fetch_quotes=None, queue_size=2)
+        slow = stream.subscribe(["TCS"])
+        for price in range(3):
+            stream.publish([self.quote("TCS", price)])
+
+        assert slow.dropped
+        assert slow not in stream.subscribers
+        assert slow.queue.get_nowait() is None
+        assert stream.get_stats()["dropped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_closed_market_polls_only_new_symbols(self):
+        """Test a closed market skips symbols whose last quote is already known"""
+        calls = []
+
+        async def fetch(symbols):
+            calls.append(symbols)
+            return [self.quote(symbol, 1) for symbol in symbols]
+
+        stream = QuoteStream(fetch, interval=0.01, is_active=lambda: False)
+        stream.publish([self.quote("TCS", 1)])
+        stream.subscribe(["TCS", "INFY"])
+        task = asyncio.create_task(stream.run())
+        await asyncio.sleep(0.025)
+        task.cancel()
+
+        assert calls == [["INFY"]]
+
+
+class TestTradingCalendar:
+    """Test NSE sessions and market-aware TTLs"""
+
+    @staticmethod
+    def ist(*args):
+        return datetime(*args, tzinfo=IST)
+
+    def test_phases(self):
+        """Test session phases on a trading day, a weekend and a holiday"""
+        calendar = TradingCalendar({date(2026, 4, 3)})
+        assert calendar.phase(self.ist(2026, 4, 2, 8, 59)) == "closed"
+        assert calendar.phase(self.ist(2026, 4, 2, 9, 5)) == "pre_open"
+        assert calendar.phase(self.ist(2026, 4, 2, 11, 0)) == "open"
+        assert calendar.phase(self.ist(2026, 4, 2, 15, 45)) == "post_close"
+        assert calendar.phase(self.ist(2026, 4, 2, 16, 0)) == "closed"
+        assert calendar.phase(self.ist(2026, 4, 3, 11, 0)) == "closed"
+        assert calendar.phase(self.ist(2026, 4, 4, 11, 0)) == "closed"
+        # Naive datetimes are UTC: 05:30 UTC is 11:00 IST
+        assert calendar.phase(datetime(2026, 4, 2, 5, 30)) == "open"
+
+    def test_ttl_runs_to_next_session(self):
+        """Test closed-market TTLs skip the weekend and holidays, capped by max_ttl"""
+        calendar = TradingCalendar({date(2026, 4, 3)})
+        thursday_evening = self.ist(2026, 4, 2, 17, 0)
+        assert calendar.next_session(thursday_evening) == self.ist(2026, 4, 6, 9, 0)
+        assert calendar.cache_ttl(30, thursday_evening) == 88 * 3600
+        assert calendar.cache_ttl(30, thursday_evening, max_ttl=86400) == 86400
+        assert calendar.cache_ttl(30, self.ist(2026, 4, 6, 10, 0)) == 30
+        assert calendar.refresh_delay(60, self.ist(2026, 4, 6, 8, 30)) == 1800
+
+    def test_bundled_holidays(self):
+        """Test the bundled holiday file parses"""
+        holidays = load_holidays(os.path.join(os.path.dirname(__file__), "data", "nse_holidays.csv"))
+        assert date(2026, 12, 25) in holidays
+        assert all(day.weekday() < 5 for day in holidays)
+
 
 class TestDatabaseService:
     """Test database service"""
@@ -225,6 +1418,123 @@ class TestAPIEndpoints:
         assert "response" in data
         assert data["response"] == "Test AI response"
 
+    def test_stocks_etag_and_delta(self, client):
+        """Test conditional GET and since-generation deltas on /stocks"""
+        quotes = [
+            {"symbol": "AAA", "lastPrice": "1.00", "otherDetails": {"volume": 1}},
+            {"symbol": "BBB", "lastPrice": "2.00", "otherDetails": {"volume": 2}}
+        ]
+        main_module.nse_service._publish_snapshot(quotes, 0)
+        generation = main_module.nse_service.snapshot.generation
+
+        response = client.get("/stocks")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        response = client.get("/stocks", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        quotes = [quotes[0], {"symbol": "BBB", "lastPrice": "2.50", "otherDetails": {"volume": 2}}]
+        main_module.nse_service._publish_snapshot(quotes, 0)
+
+        response = client.get("/stocks", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+        response = client.get("/stocks", params={"since": generation})
+        data = response.json()
+        assert [q["symbol"] for q in data["data"]] == ["BBB"]
+        assert data["generation"] == generation + 1
+
+        # Repeat queries in one generation are served from the same encoded body
+        snapshot = main_module.nse_service.snapshot
+        assert client.get("/stocks?limit=5").content == client.get("/stocks?limit=5").content
+        assert any(key.startswith("limit=5|") for key in snapshot.encoded)
+
+    def test_stocks_etag_differs_across_restarts(self):
+        """Test a restarted process never reuses an ETag for different quotes"""
+        etags = []
+        for price in ("100.00", "250.00"):
+            service = NSEDataService()
+            service.restore_snapshot({
+                "timestamp": datetime.utcnow().isoformat(),
+                "data": [{"symbol": "AAA", "lastPrice": price, "otherDetails": {"volume": 1}}]
+            })
+            etags.append(service.snapshot_etag("limit=5"))
+        assert etags[0] != etags[1]
+
+    def test_stocks_fields_validation(self, client):
+        """Test sparse fieldsets and parameter validation on /stocks"""
+        quotes = [{"symbol": "AAA", "name": "A", "lastPrice": "1.00", "otherDetails": {"volume": 1}}]
+        main_module.nse_service._publish_snapshot(quotes, 0)
+
+        response = client.get("/stocks?fields=symbol,lastPrice&sort=volume")
+        assert response.json()["data"] == [{"symbol": "AAA", "lastPrice": "1.00"}]
+        assert client.get("/stocks?fields=symbol,secret").status_code == 400
+        assert client.get("/stocks?sort=name").status_code == 422
+
+    def test_stocks_compare(self, client):
+        """Test symbol order does not change the cache key"""
+        result = {"symbols": ["INFY", "TCS"], "correlation": [[1.0, 0.5], [0.5, 1.0]]}
+        with patch.object(main_module.nse_service, "compare_stocks", return_value=result) as mock_compare:
+            first = client.get("/stocks/compare?symbols=tcs,INFY&period=6mo")
+            second = client.get("/stocks/compare?symbols=INFY,TCS&period=6mo")
+
+        assert first.status_code == second.status_code == 200
+        assert second.json()["correlation"] == result["correlation"]
+        mock_compare.assert_called_once_with(["INFY", "TCS"], "6mo")
+
+        assert client.get("/stocks/compare?symbols=TCS").status_code == 400
+        with patch.object(main_module.nse_service, "compare_stocks") as mock_compare:
+            assert client.get("/stocks/compare?symbols=TCS,ZZZ1").status_code == 404
+        mock_compare.assert_not_called()
+        assert client.get("/stocks/compare?symbols=TCS,INFY&period=7y").status_code == 422
+
+    def test_stock_detail_from_cache_bytes(self, client):
+        """Test stock detail is fetched once and returned as cached JSON"""
+        detail = {"symbol": "NESTLEIND", "name": "Test", "lastPrice": "1.00", "otherDetails": {"volume": 5}}
+        with patch.object(main_module.nse_service, "get_stock_detail", return_value=detail) as mock_detail:
+            first = client.get("/stocks/NESTLEIND")
+            second = client.get("/stocks/NESTLEIND")
+
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json() == detail
+        assert second.headers["content-type"] == "application/json"
+        mock_detail.assert_called_once_with("NESTLEIND")
+
+    def test_stock_detail_symbol_normalized(self, client):
+        """Test lowercase detail requests share the uppercase cache entry and symbol tag"""
+        detail = {"symbol": "BRITANNIA", "name": "Test", "lastPrice": "1.00", "otherDetails": {}}
+        with patch.object(main_module.nse_service, "get_stock_detail", return_value=detail) as mock_detail:
+            assert client.get("/stocks/britannia").status_code == 200
+            assert client.get("/stocks/BRITANNIA").status_code == 200
+        mock_detail.assert_called_once_with("BRITANNIA")
+        assert "stock_detail:BRITANNIA" in main_module.cache_service.memory_cache
+        assert asyncio.run(main_module.cache_service.invalidate_tag("symbol:BRITANNIA")) == 1
+
+    def test_unknown_symbols_rejected(self, client):
+        """Test symbols outside the ticker master never reach the provider"""
+        with patch.object(main_module.nse_service, "get_stock_detail") as mock_detail:
+            assert client.get("/stocks/ZZZ1").status_code == 404
+        mock_detail.assert_not_called()
+
+        with patch.object(main_module.nse_service, "_fill_history") as mock_fill:
+            assert client.get("/stocks/ZZZ1/history").status_code == 404
+            assert client.get("/stocks/ZZZ1/indicators").status_code == 404
+        mock_fill.assert_not_called()
+
+        response = client.get("/stocks/stream?symbols=TCS,ZZZ1,ZZZ2")
+        assert response.status_code == 400
+        assert "ZZZ1,ZZZ2" in response.json()["error"]
+
+    def test_metrics_endpoint(self, client):
+        """Test cache metrics are exposed in Prometheus text format"""
+        client.get("/indices")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'financer_cache_misses_total{namespace="market_indices"}' in response.text
+
     def test_fd_calculator(self, client):
         """Test FD calculator endpoint"""
         response = client.post("/calculator/fd", json={
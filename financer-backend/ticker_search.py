@@ -0,0 +1,173 @@
+"""
+NSE ticker master and in-memory symbol/company-name search index.
+"""
+
+import csv
+import gzip
+import logging
+import re
+import sys
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+
+@dataclass(frozen=True)
+class TickerRecord:
+    """One row of the NSE equity master"""
+    symbol: str
+    name: str
+    sector: Optional[str] = None
+
+
+def load_ticker_master(path: str) -> List[TickerRecord]:
+    """Load an NSE EQUITY_L style CSV (optionally gzipped), keeping EQ series rows"""
+    opener = gzip.open if path.endswith(".gz") else open
+    records = []
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        # NSE's own export pads some header names with spaces
+        reader.fieldnames = [name.strip().upper() for name in reader.fieldnames or []]
+        for row in reader:
+            symbol = (row.get("SYMBOL") or "").strip()
+            series = (row.get("SERIES") or "EQ").strip()
+            if not symbol or series != "EQ":
+                continue
+            records.append(TickerRecord(
+                symbol=symbol,
+                name=(row.get("NAME OF COMPANY") or symbol).strip(),
+                sector=(row.get("SECTOR") or "").strip() or None
+            ))
+    return records
+
+
+def _normalize(text: str) -> str:
+    """Upper-case and collapse punctuation to single spaces"""
+    return _NON_ALNUM.sub(" ", text.upper()).strip()
+
+
+def _trigrams(text: str) -> set:
+    """Padded character trigrams of each word"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate deep size of containers built from builtins and TickerRecords"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_sizeof(k, seen) + _sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, TickerRecord):
+        size += sum(_sizeof(value, seen) for value in (obj.symbol, obj.name, obj.sector))
+    return size
+
+
+class TickerIndex:
+    """Prefix and trigram index over ticker symbols and company names"""
+
+    MAX_PREFIX_SCAN = 200
+
+    def __init__(self, records: List[TickerRecord]):
+        start = time.perf_counter()
+        self.records = records
+
+        # Sorted (key, record id) lists answer prefix queries with bisect
+        self._symbols = self._sorted_keys((r.symbol.upper(), i) for i, r in enumerate(records))
+        self._names = self._sorted_keys((_normalize(r.name), i) for i, r in enumerate(records))
+        self._words = self._sorted_keys(
+            (word, i) for i, r in enumerate(records) for word in set(_normalize(r.name).split())
+        )
+
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, r in enumerate(records):
+            for gram in _trigrams(f"{_normalize(r.symbol)} {_normalize(r.name)}"):
+                postings[gram].append(i)
+        self._postings = dict(postings)
+
+        self.build_ms = (time.perf_counter() - start) * 1000
+        self.memory_bytes = sum(
+            _sizeof(part) for part in (self.records, self._symbols, self._names, self._words, self._postings)
+        )
+        logger.info(
+            f"Ticker index built for {len(records)} symbols in {self.build_ms:.1f}ms "
+            f"({self.memory_bytes / 1024:.0f} KiB)"
+        )
+
+    @staticmethod
+    def _sorted_keys(pairs) -> Tuple[List[str], List[int]]:
+        ordered = sorted(pairs)
+        return [key for key, _ in ordered], [i for _, i in ordered]
+
+    def _prefix_ids(self, index: Tuple[List[str], List[int]], prefix: str) -> List[int]:
+        keys, ids = index
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + "\uffff", lo)
+        return ids[lo:min(hi, lo + self.MAX_PREFIX_SCAN)]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Rank records by exact symbol, symbol prefix, name prefix, then trigram similarity"""
+        normalized = _normalize(query)
+        if not normalized:
+            return []
+
+        scores: Dict[int, float] = {}
+
+        def bump(record_id: int, score: float):
+            if score > scores.get(record_id, 0):
+                scores[record_id] = score
+
+        compact = normalized.replace(" ", "")
+        for record_id in self._prefix_ids(self._symbols, query.strip().upper()):
+            exact = self.records[record_id].symbol.upper() == query.strip().upper()
+            bump(record_id, 100 if exact else 90 - len(self.records[record_id].symbol) * 0.1)
+        for record_id in self._prefix_ids(self._names, normalized):
+            bump(record_id, 80)
+        for record_id in self._prefix_ids(self._words, normalized.split()[-1]):
+            bump(record_id, 70)
+
+        if len(scores) < limit:
+            # Fuzzy fallback for typos: share of query trigrams found in the record
+            query_grams = _trigrams(normalized) | _trigrams(compact)
+            overlap: Dict[int, int] = defaultdict(int)
+            for gram in query_grams:
+                for record_id in self._postings.get(gram, ()):
+                    overlap[record_id] += 1
+            for record_id, shared in overlap.items():
+                containment = shared / len(query_grams)
+                if containment >= 0.5:
+                    bump(record_id, 50 * containment)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.records[item[0]].symbol))
+        return [
+            {
+                "symbol": self.records[record_id].symbol,
+                "name": self.records[record_id].name,
+                "sector": self.records[record_id].sector,
+                "score": round(score, 2)
+            }
+            for record_id, score in ranked[:limit]
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Index size, build time and memory footprint"""
+        return {
+            "symbols": len(self.records),
+            "trigrams": len(self._postings),
+            "build_ms": round(self.build_ms, 2),
+            "memory_kib": round(self.memory_bytes / 1024, 1)
+        }
@@ -0,0 +1,132 @@
+"""
+NSE trading calendar: IST session times, exchange holidays and market-aware cache TTLs.
+"""
+
+import csv
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+
+PRE_OPEN = "pre_open"
+OPEN = "open"
+POST_CLOSE = "post_close"
+CLOSED = "closed"
+
+
+def load_holidays(path: str) -> Set[date]:
+    """Read exchange holidays from a CSV with an ISO `date` column"""
+    holidays = set()
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            value = (row.get("date") or "").strip()
+            if value:
+                holidays.add(date.fromisoformat(value))
+    return holidays
+
+
+class TradingCalendar:
+    """NSE equity sessions in IST; weekends and listed holidays are closed all day"""
+
+    def __init__(
+        self,
+        holidays: Iterable[date] = (),
+        pre_open: time = time(9, 0),
+        market_open: time = time(9, 15),
+        market_close: time = time(15, 30),
+        post_close_end: time = time(16, 0)
+    ):
+        self.holidays = set(holidays)
+        self.pre_open = pre_open
+        self.market_open = market_open
+        self.market_close = market_close
+        self.post_close_end = post_close_end
+
+    @staticmethod
+    def _ist(now: Optional[datetime]) -> datetime:
+        """Current time in IST; naive datetimes are taken as UTC like the rest of the backend"""
+        if now is None:
+            return datetime.now(IST)
+        if now.tzinfo is None:
+            now = now.replace(tzinfo=timezone.utc)
+        return now.astimezone(IST)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def phase(self, now: Optional[datetime] = None) -> str:
+        """pre_open, open, post_close or closed"""
+        now = self._ist(now)
+        if not self.is_trading_day(now.date()):
+            return CLOSED
+        t = now.time()
+        if self.pre_open <= t < self.market_open:
+            return PRE_OPEN
+        if self.market_open <= t < self.market_close:
+            return OPEN
+        if self.market_close <= t < self.post_close_end:
+            # Closing prices are still being settled
+            return POST_CLOSE
+        return CLOSED
+
+    def is_active(self, now: Optional[datetime] = None) -> bool:
+        """Whether quotes can still change: any phase from pre-open to the end of post-close"""
+        return self.phase(now) != CLOSED
+
+    def next_session(self, now: Optional[datetime] = None) -> datetime:
+        """Pre-open start of the next trading day whose session has not begun yet"""
+        now = self._ist(now)
+        day = now.date()
+        if now.time() >= self.pre_open:
+            day += timedelta(days=1)
+        for _ in range(366):
+            if self.is_trading_day(day):
+                return datetime.combine(day, self.pre_open, tzinfo=IST)
+            day += timedelta(days=1)
+        raise ValueError("No trading day within a year; check the holiday list")
+
+    def refresh_delay(
+        self,
+        interval: float,
+        now: Optional[datetime] = None,
+        max_delay: Optional[float] = None
+    ) -> float:
+        """`interval` during sessions, otherwise the time left until the next pre-open"""
+        now = self._ist(now)
+        if self.phase(now) != CLOSED:
+            return interval
+        delay = max((self.next_session(now) - now).total_seconds(), 1.0)
+        return min(delay, max_delay) if max_delay else delay
+
+    def cache_ttl(self, active_ttl: int, now: Optional[datetime] = None, max_ttl: Optional[int] = None) -> int:
+        """Cache TTL for market data: short while trading, until the next session when closed"""
+        return int(self.refresh_delay(active_ttl, now, max_ttl))
+
+    def get_status(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Current phase and next session, for health checks"""
+        now = self._ist(now)
+        return {
+            "phase": self.phase(now),
+            "now_ist": now.isoformat(timespec="seconds"),
+            "next_session": self.next_session(now).isoformat(),
+            "holidays": len(self.holidays),
+            "holidays_through": max(self.holidays).isoformat() if self.holidays else None
+        }
+
+
+def load_trading_calendar(path: str) -> TradingCalendar:
+    """Calendar with holidays from `path`; weekends only if the file cannot be read"""
+    try:
+        holidays = load_holidays(path)
+    except Exception as e:
+        logger.warning(f"Failed to load trading holidays {path}: {e}")
+        return TradingCalendar()
+
+    current_year = datetime.now(IST).year
+    if not any(day.year == current_year for day in holidays):
+        logger.warning(f"Trading holiday list {path} has no entries for {current_year}")
+    logger.info(f"Loaded {len(holidays)} trading holidays from {path}")
+    return TradingCalendar(holidays)
@@ -0,0 +1,372 @@
+"""
+Infrastructure for blocking upstream market data calls.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scheduler lanes, highest priority first
+LANES = ("interactive", "refresh", "backfill")
+
+_lane: contextvars.ContextVar = contextvars.ContextVar("upstream_lane", default="interactive")
+
+
+@contextmanager
+def upstream_lane(lane: str):
+    """Tag upstream calls made inside the block (and tasks it starts) with a scheduler lane"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the upstream executor queue is full"""
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is failing"""
+    pass
+
+
+class UpstreamExecutor:
+    """Named, bounded thread pool for blocking upstream calls with wait-time stats"""
+
+    def __init__(
+        self,
+        name: str = "upstream",
+        max_workers: int = 8,
+        max_queue: int = 32,
+        timeout: float = 30.0
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        self._pending = 0  # submitted and not yet finished, including timed-out work
+        self._active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    async def run(self, func: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Run a blocking callable on the pool without blocking the event loop"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError(
+                    f"{self.name} executor saturated ({self._pending} calls pending)"
+                )
+            self._pending += 1
+            self.submitted += 1
+
+        queued_at = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                self._active += 1
+                wait = started - queued_at
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                result = func()
+                with self._lock:
+                    self.completed += 1
+                return result
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._total_run += time.perf_counter() - started
+
+        future = self._pool.submit(call)
+        # The slot is released when the thread finishes, even if the caller timed out
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout if timeout is not None else self.timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            logger.warning(f"{self.name} executor call timed out")
+            raise
+
+    def _release(self, future: Future):
+        """Free a pending slot once submitted work has finished or been cancelled"""
+        with self._lock:
+            self._pending -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Occupancy and wait-time statistics"""
+        with self._lock:
+            started = self.completed + self.failed + self._active
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": max(self._pending - self._active, 0),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2),
+                "avg_run_ms": round(self._total_run / (self.completed + self.failed) * 1000, 2)
+                if self.completed + self.failed else 0.0
+            }
+
+    def shutdown(self):
+        """Stop accepting work and drop queued calls"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class CircuitBreaker:
+    """Stop calling a failing upstream, then let a few probes through after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str = "upstream",
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        excluded: Tuple[type, ...] = (),
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        # Errors raised to the caller without counting against upstream health
+        self.excluded = excluded
+        self._clock = clock
+
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._probes = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {}
+        self._history: deque = deque(maxlen=20)
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the cool-down has passed"""
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str):
+        key = f"{self._state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self._history.append({"transition": key, "at": datetime.utcnow().isoformat()})
+        log = logger.warning if state == self.OPEN else logger.info
+        log(f"{self.name} circuit {key}")
+        self._state = state
+        if state == self.OPEN:
+            self._opened_at = self._clock()
+        self._probes = 0
+        self._consecutive_failures = 0
+
+    async def call(self, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the call if the circuit allows it, recording the outcome"""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probes >= self.half_open_max_calls):
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        if state == self.HALF_OPEN:
+            self._probes += 1
+
+        try:
+            result = await coro_factory()
+        except (asyncio.CancelledError, *self.excluded):
+            # A cancelled or excluded call says nothing about upstream health; free its probe slot
+            if state == self.HALF_OPEN and self._state == self.HALF_OPEN:
+                self._probes -= 1
+            raise
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self._record_success()
+        return result
+
+    def _record_success(self):
+        self.successes += 1
+        if self._state == self.HALF_OPEN:
+            self._transition(self.CLOSED)
+        else:
+            self._consecutive_failures = 0
+
+    def _record_failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self._state == self.HALF_OPEN:
+            # A failed probe restarts the cool-down
+            self._transition(self.OPEN)
+        elif self._state == self.CLOSED:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._transition(self.OPEN)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """State, counters and recent transitions"""
+        state = self.state
+        return {
+            "name": self.name,
+            "state": state,
+            "consecutive_failures": self._consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(max(self.reset_timeout - (self._clock() - self._opened_at), 0), 1)
+            if state == self.OPEN else None,
+            "transitions": dict(self.transitions),
+            "recent_transitions": list(self._history),
+            "last_error": self.last_error
+        }
+
+
+class TokenBucketScheduler:
+    """Async token bucket that hands out upstream call permits by strict lane priority"""
+
+    def __init__(self, name: str = "upstream", rate: float = 2.0, burst: int = 4, lanes: Tuple[str, ...] = LANES):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.lanes = lanes
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._queues: Dict[str, Deque[Tuple[asyncio.Future, float]]] = {lane: deque() for lane in lanes}
+        self._pump: Optional[asyncio.Task] = None
+        self._stats = {
+            lane: {"granted": 0, "cancelled": 0, "max_depth": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for lane in lanes
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _record(self, lane: str, waited: float):
+        stats = self._stats[lane]
+        stats["granted"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+
+    async def acquire(self, lane: Optional[str] = None):
+        """Wait for a permit; lower lanes wait while any higher lane has callers queued"""
+        lane = lane or current_lane()
+        if lane not in self._queues:
+            raise ValueError(f"Unknown scheduler lane '{lane}'")
+        if self.rate <= 0:
+            self._record(lane, 0.0)
+            return
+
+        self._refill()
+        if self._tokens >= 1 and not any(self._queues.values()):
+            self._tokens -= 1
+            self._record(lane, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        queued_at = time.monotonic()
+        queue = self._queues[lane]
+        queue.append((future, queued_at))
+        self._stats[lane]["max_depth"] = max(self._stats[lane]["max_depth"], len(queue))
+        if self._pump is None or self._pump.done() or self._pump.get_loop() is not asyncio.get_running_loop():
+            self._pump = asyncio.create_task(self._dispatch())
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller went away; return the token
+                self._tokens = min(self.burst, self._tokens + 1)
+            self._stats[lane]["cancelled"] += 1
+            raise
+        self._record(lane, time.monotonic() - queued_at)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for lane in self.lanes:
+            queue = self._queues[lane]
+            while queue:
+                future, _ = queue.popleft()
+                if not future.done():
+                    return future
+        return None
+
+    async def _dispatch(self):
+        """Grant permits to queued callers as tokens refill"""
+        while any(self._queues.values()):
+            self._refill()
+            while self._tokens >= 1:
+                future = self._next_waiter()
+                if future is None:
+                    break
+                self._tokens -= 1
+                future.set_result(None)
+            if not any(self._queues.values()):
+                break
+            await asyncio.sleep(max((1 - self._tokens) / self.rate, 0.001))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Token level and per-lane queue depth and wait times"""
+        self._refill()
+        lanes = {}
+        for lane in self.lanes:
+            stats = self._stats[lane]
+            lanes[lane] = {
+                "queued": sum(1 for future, _ in self._queues[lane] if not future.done()),
+                "max_depth": stats["max_depth"],
+                "granted": stats["granted"],
+                "cancelled": stats["cancelled"],
+                "avg_wait_ms": round(stats["total_wait"] / stats["granted"] * 1000, 2) if stats["granted"] else 0.0,
+                "max_wait_ms": round(stats["max_wait"] * 1000, 2)
+            }
+        return {
+            "name": self.name,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "lanes": lanes
+        }